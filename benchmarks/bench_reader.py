@@ -0,0 +1,70 @@
+"""Сравнение однопроходного TraceReader с прежним чтением через polars.
+
+Запуск: python -m benchmarks.bench_reader [путь до файла УИДТ] [--repeat N]
+"""
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import polars as pl
+
+from src.reader.trace_reader import TraceReader
+
+DEFAULT_FILE = Path(__file__).parent.parent / "test_path" / "exp_02_04_2025__16_55_46__468.csv"
+
+
+def read_polars(path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Прежний путь: три прохода по заголовку и polars.read_csv для тела"""
+    with path.open() as f:
+        for skip_rows, line in enumerate(f):
+            if line.split(";")[0] == "Length:":
+                freqs = line.strip().split(";f(MHz)=")[1:]
+                break
+    with path.open() as f:
+        for line in f:
+            if line.startswith("Point"):
+                np.array(line.strip().split(";")[1:], dtype=float)
+                break
+    with path.open() as f:
+        f.readline()
+        num_phase = int(f.readline().split(";")[3].split("=")[1])
+    data = pl.read_csv(
+        path,
+        separator=";",
+        skip_rows=skip_rows,
+        columns=range(0, len(freqs) + 1),
+        truncate_ragged_lines=True
+        ).with_columns([pl.col("*").cast(pl.Float32)]).to_numpy()
+    return data[:, 1:], np.array(freqs, dtype=np.float32), data[:, 0], num_phase
+
+
+def read_trace(path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    trace = TraceReader().read(path)
+    return trace.data, trace.header.freqs, trace.length, trace.header.num_phase
+
+
+def timeit(func, path: Path, repeat: int) -> float:
+    func(path)
+    start = perf_counter()
+    for _ in range(repeat):
+        func(path)
+    return (perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path, nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    ref, new = read_polars(args.path), read_trace(args.path)
+    for a, b in zip(ref, new):
+        np.testing.assert_array_equal(a, b)
+
+    for name, func in (("polars", read_polars), ("trace_reader", read_trace)):
+        print(f"{name:>14}: {timeit(func, args.path, args.repeat) * 1e3:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Время запуска process-uidt и загружаемые при этом тяжёлые библиотеки.
+
+Запуск: python -m benchmarks.bench_startup [--repeat N]
+
+Каждый случай выполняется в отдельном интерпретаторе. Время - медиана по repeat
+запускам, включая старт Python. Для каждого случая выводится, какие из
+matplotlib, scipy, polars, joblib, pydantic и watchdog оказались загружены.
+Подробности по модулям: python -X importtime -c "import src.main".
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+HEAVY = ["matplotlib", "scipy", "polars", "joblib", "pydantic", "watchdog"]
+
+_REPORT = "import sys; print(' '.join(m for m in {heavy} if m in sys.modules), file=sys.stderr)"
+
+CASES = {
+    "import src.main": "import src.main",
+    "--help": "import sys; sys.argv = ['process-uidt', '--help']\n"
+              "from src.main import main\ntry:\n    main()\nexcept SystemExit:\n    pass",
+    "шаблон params.yaml": "import sys; sys.argv = ['process-uidt', '--path', {tmp!r}]\n"
+                          "from src.initializer.initializer import Reader\nfrom pathlib import Path\n"
+                          "from src.main import CommandLineParser\nargs = CommandLineParser().parse()\n"
+                          "Reader(Path(args.path) / 'params.yaml').write_default_init_file()",
+    "Processor без графиков": "from src.initializer.initializer import AppParams\n"
+                              "from src.processing.processor import Processor\n"
+                              "Processor(AppParams(plots=False, metrics=False), 'off').close()",
+    "Processor с графиками": "from src.initializer.initializer import AppParams\n"
+                             "from src.processing.processor import Processor\n"
+                             "Processor(AppParams(render_workers=0, metrics=False), 'off').close()",
+}
+
+
+def run_case(code: str, repeat: int) -> tuple[float, str]:
+    times, loaded = [], ""
+    for _ in range(repeat):
+        start = perf_counter()
+        done = subprocess.run([sys.executable, "-c", code + "\n" + _REPORT.format(heavy=HEAVY)],
+                              cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True)
+        times.append(perf_counter() - start)
+        loaded = done.stderr.strip().splitlines()[-1] if done.stderr.strip() else ""
+    return median(times), loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline, _ = run_case("pass", args.repeat)
+        print(f"{'случай':<26}{'время, с':>10}  загружены")
+        print(f"{'python -c pass':<26}{baseline:>10.3f}")
+        for name, code in CASES.items():
+            elapsed, loaded = run_case(code.format(tmp=tmp), args.repeat)
+            print(f"{name:<26}{elapsed:>10.3f}  {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    main()
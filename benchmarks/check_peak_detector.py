@@ -0,0 +1,59 @@
+"""Сверка PeakFinder._get_peaks_vectorized с PeakFinder._get_peaks и сравнение времени.
+
+Запуск: python -m benchmarks.check_peak_detector [путь до файла УИДТ] [--random N]
+
+Расхождения допустимы только на столбцах с точно равными высотами пиков:
+порядок выбора среди равных в find_peaks зависит от алгоритма сортировки.
+"""
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from src.processing.peak_finder import PeakFinder
+from src.reader.trace_reader import TraceReader
+
+DEFAULT_FILE = Path(__file__).parent.parent / "test_path" / "exp_02_04_2025__16_55_46__468.csv"
+
+
+def load_norm(path: Path) -> np.ndarray:
+    """Данные файла, нормированные по каждой точке линии на [0, 1]"""
+    data = TraceReader().read(path).data.astype(np.float32)
+    data = data - data[:20].mean(axis=0)
+    data -= data.min(axis=1, keepdims=True)
+    return data / data.max(axis=1, keepdims=True)
+
+
+def mismatches(data: np.ndarray) -> int:
+    lo, hi = PeakFinder._get_peaks(data)
+    lo_vec, hi_vec = PeakFinder._get_peaks_vectorized(data)
+    return int(((lo != lo_vec) | (hi != hi_vec).any(axis=1)).sum())
+
+
+def timeit(func, data: np.ndarray, repeat: int = 10) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path, nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--random", type=int, default=20, help="количество случайных матриц")
+    args = parser.parse_args()
+
+    data = load_norm(args.path)
+    print(f"{args.path.name}: расхождений {mismatches(data)} из {data.shape[0]}")
+
+    rng = np.random.default_rng(0)
+    total = sum(mismatches(rng.random((500, data.shape[1])).astype(np.float32)) for _ in range(args.random))
+    print(f"случайные данные: расхождений {total} из {500 * args.random}")
+
+    print(f"        loop: {timeit(PeakFinder._get_peaks, data) * 1e3:.2f} мс")
+    print(f"  vectorized: {timeit(PeakFinder._get_peaks_vectorized, data) * 1e3:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Замена программы прибора для проверки приёма данных без файлов (process-uidt --ingest).
+
+Запуск: python -m benchmarks.ingest_producer [--socket путь] [--count N] [--interval с]
+        [--points N] [--freqs N] [--phases N] [--data-type refl|analyze] [--seed N]
+
+Синтетические рефлектограммы (benchmarks.synthetic) отправляются кадрами src.ingest.protocol
+в Unix-сокет или, без --socket, в stdout:
+    python -m benchmarks.ingest_producer --count 10 | process-uidt --path ./out --ingest -
+    process-uidt --path ./out --ingest /tmp/uidt.sock
+    python -m benchmarks.ingest_producer --socket /tmp/uidt.sock --count 10
+По сокету для каждого кадра печатается время до ответа и отклонение f0 от истинного.
+"""
+import argparse
+import socket
+import sys
+from time import perf_counter, sleep
+
+import numpy as np
+
+from benchmarks.synthetic import synthesize
+from src.ingest.protocol import read_frame, write_frame
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", type=str, default=None)
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=0)
+    parser.add_argument("--points", type=int, default=1500)
+    parser.add_argument("--freqs", type=int, default=81)
+    parser.add_argument("--phases", type=int, default=1)
+    parser.add_argument("--data-type", choices=["refl", "analyze"], default="refl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    conn = None
+    if args.socket is not None:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(args.socket)
+        writer, reader = conn.makefile("wb"), conn.makefile("rb")
+    else:
+        writer, reader = sys.stdout.buffer, None
+
+    try:
+        for i in range(args.count):
+            freqs, length, body, mu = synthesize(args.points, args.freqs, args.phases, args.data_type,
+                                                 seed=args.seed + i)
+            header = {"name": f"synthetic_{args.data_type}_{i:04d}", "freqs": freqs,
+                      "distances": length, "datarate": args.phases}
+            start = perf_counter()
+            write_frame(writer, header, body)
+            if reader is not None:
+                reply = read_frame(reader)
+                if reply is None:
+                    break
+                meta, peaks = reply
+                if "error" in meta:
+                    print(f"{header['name']}: {meta['error']}")
+                    continue
+                truth = np.interp(peaks[:, 0], length, np.repeat(mu.mean(axis=1), args.phases))
+                valid = np.isfinite(truth)
+                error = np.median(np.abs(peaks[valid, 1] - truth[valid])) if valid.any() else np.nan
+                print(f"{meta['name']}: {perf_counter() - start:.3f} с, медиана |f0 - истина| {error:.2f} МГц")
+            if args.interval:
+                sleep(args.interval)
+    finally:
+        if conn is not None:
+            writer.close()
+            reader.close()
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
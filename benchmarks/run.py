@@ -0,0 +1,158 @@
+"""Замер времени этапов обработки на синтетических файлах и проверка точности.
+
+Запуск: python -m benchmarks.run [--sizes 500x41x1 1500x81x1 ...] [--data-type refl analyze]
+        [--engine curve_fit batched loglinear ...] [--fit-seed default loglinear ...]
+        [--repeat N] [--plots] [--output results.json]
+
+Размер задаётся как точки x частоты x сдвиги фазы. Для каждого размера, типа данных
+и способа аппроксимации (для curve_fit и batched - и каждого начального приближения
+fit_seed) генерируется файл (benchmarks.synthetic), затем замеряются
+Processor._read_file, PeakFinder.find_peak, PeakFinder.get_approx_laplace,
+StatsComputer.compute_std, графики (если --plots) и Processor.process_file целиком.
+Время - медиана по repeat повторам. Точность - отклонение найденных f0 от
+истинных: медиана, 95-й перцентиль и доля точек в пределах шага частоты.
+Результаты печатаются таблицей и сохраняются в JSON для сравнения между версиями.
+"""
+import argparse
+import json
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticTrace, generate
+from src.initializer.initializer import AppParams
+from src.processing.closed_form import ClosedFormEstimator
+from src.processing.processor import Processor
+from src.saver.render_queue import RenderJob, render
+
+
+def timeit(func: Callable, repeat: int) -> tuple[float, object]:
+    times, result = [], None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = func()
+        times.append(perf_counter() - start)
+    return median(times), result
+
+
+def accuracy(f0: np.ndarray, trace: SyntheticTrace, start: int, freq_step: float) -> dict[str, float]:
+    truth = trace.f0[start: start + f0.size]
+    valid = np.isfinite(truth)
+    error = np.abs(f0[valid] - truth[valid])
+    return {
+        "median_abs_error": float(np.median(error)),
+        "p95_abs_error": float(np.percentile(error, 95)),
+        "within_step": float(np.mean(error <= freq_step)),
+    }
+
+
+def bench_case(trace: SyntheticTrace, engine: str, repeat: int, plots: bool,
+               fit_seed: str = "default") -> dict:
+    params = AppParams(data_type=trace.data_type, fit_engine=engine, fit_seed=fit_seed,
+                       plots=plots, render_workers=0,
+                       point_start=0, point_end=trace.dx * trace.points * trace.phases,
+                       point_cut=trace.dx * trace.points * trace.phases / 2,
+                       freq_cut=int(trace.freqs[trace.freqs.size // 2]),
+                       num_pts_norm=trace.num_pts_norm, metrics=False)
+    processor = Processor(params, "off")
+    path = trace.path
+    timings = {}
+
+    timings["read_file"], _ = timeit(lambda: processor._read_file(path), repeat)
+    data_norm, freqs, length, dx, _, _ = processor._data_prepare(path)
+    point_end = min(data_norm.shape[0] * dx - dx, params.point_end)
+    start, end = processor._get_index(params.point_start, dx), processor._get_index(point_end, dx)
+    data_max = processor._norm_data_by_max(data_norm.copy()).T
+    finder = processor.finder
+
+    def find_peak():
+        context = finder.create_context(freqs, data_max)
+        return context, finder.find_peak(context, start, end)
+    timings["find_peak"], (context, f0) = timeit(find_peak, repeat)
+
+    rows = [start, processor._get_index(params.point_cut, dx), end]
+    timings["get_approx_laplace"], laplace = timeit(lambda: finder.get_approx_laplace(context, rows), repeat)
+    timings["compute_std"], _ = timeit(lambda: processor.stats_cumputer.compute_std(f0), repeat)
+
+    if plots:
+        figures = path.parent / "Figures"
+        stats = processor.stats_cumputer.compute(f0)
+        job = RenderJob(processor.plotter.for_file(figures, dx, point_end),
+                        processor.stats_plotter.for_file(figures),
+                        path, data_norm, np.asarray(freqs), np.array(length), f0, laplace,
+                        stats, np.array(length[start: end]))
+        timings["plot"], _ = timeit(lambda: render(job), repeat)
+
+    def process_file():
+        # Журнал обработанных файлов сбрасываем, иначе повтор будет пропущен
+        shutil.rmtree(path.parent / "Peaks", ignore_errors=True)
+        processor.manifests.clear()
+        processor.process_file(path)
+    timings["process_file"], _ = timeit(process_file, repeat)
+    processor.close()
+
+    return {
+        "points": trace.points,
+        "freqs": int(trace.freqs.size),
+        "phases": trace.phases,
+        "data_type": trace.data_type,
+        "engine": engine,
+        "fit_seed": fit_seed,
+        "timings": timings,
+        "accuracy": accuracy(f0, trace, start, float(freqs[1] - freqs[0])),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["500x41x1", "1500x81x1", "5000x81x1", "1500x81x4"])
+    parser.add_argument("--data-type", nargs="+", default=["refl", "analyze"], choices=["refl", "analyze"])
+    engines = ["curve_fit", "batched", *ClosedFormEstimator.METHODS]
+    parser.add_argument("--engine", nargs="+", default=engines, choices=engines)
+    parser.add_argument("--fit-seed", nargs="+", default=["default"],
+                        choices=["default", *ClosedFormEstimator.METHODS])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--plots", action="store_true", help="замерять построение графиков")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            points, n_freqs, phases = (int(v) for v in size.split("x"))
+            for data_type in args.data_type:
+                case_dir = Path(tmp) / f"{size}_{data_type}"
+                case_dir.mkdir()
+                trace = generate(case_dir / "synthetic.csv", points, n_freqs, phases, data_type, seed=args.seed)
+                cases = [(engine, seed) for engine in args.engine
+                         for seed in (args.fit_seed if engine in ("curve_fit", "batched") else ["default"])]
+                for engine, fit_seed in cases:
+                    result = bench_case(trace, engine, args.repeat, args.plots, fit_seed)
+                    results.append(result)
+                    timings = " ".join(f"{k}={v * 1e3:.1f}мс" for k, v in result["timings"].items())
+                    acc = result["accuracy"]
+                    name = engine if fit_seed == "default" else f"{engine}+{fit_seed}"
+                    print(f"{size:>12} {data_type:>8} {name:>20}: {timings} | "
+                          f"ошибка f0 медиана {acc['median_abs_error']:.2f} МГц, "
+                          f"в пределах шага {acc['within_step']:.1%}")
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Генератор синтетических файлов УИДТ с известными положениями пиков.
+
+Запуск: python -m benchmarks.synthetic папка [--points N] [--freqs N] [--phases N]
+        [--data-type refl|analyze] [--files N] [--seed N]
+
+Формат совпадает с файлами прибора: секции [INFO], [REFLECT], [LASER], [FREQ],
+строки "Point distances" и "Length:", затем по строке на точку линии.
+Строк в теле points * phases, сдвиги фазы одной точки идут подряд, в [REFLECT]
+points - количество строк, datarate - количество сдвигов фазы.
+
+Первые num_pts_norm точек - балласт без сигнала, по ним Processor нормирует данные.
+Дальше в каждой строке пик Лапласа ("analyze") или два пика с провалом между
+ними ("refl") на постоянной подставке с шумом. Истинная частота f0 точки -
+центр пика или среднее центров двух пиков, как её считает PeakFinder.
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+
+@dataclass
+class SyntheticTrace:
+    """Параметры и истинные частоты сгенерированного файла"""
+    path: Path
+    data_type: str
+    points: int
+    freqs: np.ndarray
+    phases: int
+    dx: float
+    f0: np.ndarray
+    num_pts_norm: int
+
+
+def _laplace(x: np.ndarray, mu: np.ndarray, b: float, a: np.ndarray) -> np.ndarray:
+    return a * np.exp(-np.abs(x - mu) / b)
+
+
+def true_peaks(points: int, freqs: np.ndarray, data_type: str, num_pts_norm: int,
+               rng: np.random.Generator) -> np.ndarray:
+    """Центры пиков по точкам линии (точки, 1 или 2): плавный дрейф и несколько ступенек"""
+    span = freqs[-1] - freqs[0]
+    x = np.linspace(0, 1, points)
+    center = freqs[0] + span * (0.5 + 0.1 * np.sin(2 * np.pi * (x * rng.uniform(1, 3) + rng.uniform())))
+    for step in rng.uniform(0, 1, 3):
+        center += np.where(x > step, rng.uniform(-0.05, 0.05) * span, 0)
+    center = np.clip(center, freqs[0] + 0.25 * span, freqs[-1] - 0.25 * span)
+    center[:num_pts_norm] = np.nan
+    if data_type == "refl":
+        # Расстояние между пиками больше 15 отсчётов сетки частот, как ждёт PeakFinder
+        half = max(0.15 * span, 10 * abs(freqs[1] - freqs[0]))
+        return np.column_stack((center - half, center + half))
+    return center[:, None]
+
+
+def synthesize(points: int = 1500, n_freqs: int = 81, phases: int = 1, data_type: str = "refl",
+               freq_start: float = 10500, freq_step: float = 5, dx: float = 2, num_pts_norm: int = 20,
+               noise: float = 0.02, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Частоты, длина, строки (points * phases, частоты) и истинные центры пиков"""
+    rng = np.random.default_rng(seed)
+    freqs = freq_start + freq_step * np.arange(n_freqs)
+    mu = true_peaks(points, freqs, data_type, num_pts_norm, rng)
+
+    width = 4 * freq_step
+    amp = rng.uniform(0.5, 1.5, points)[:, None]
+    signal = np.nan_to_num(_laplace(freqs[None, None, :], mu[:, :, None], width, amp[:, :, None])).sum(axis=1)
+    # Сдвиги фазы одной точки: тот же сигнал с другой подставкой
+    offset = 3240 + rng.normal(0, 0.01, (1, phases, n_freqs))
+    body = (offset + signal[:, None, :] * rng.uniform(0.05, 0.1)
+            + rng.normal(0, noise * 0.1, (points, phases, n_freqs))).reshape(-1, n_freqs)
+    length = dx * np.arange(points * phases)
+    return freqs, length, body, mu
+
+
+def generate(path: Path, points: int = 1500, n_freqs: int = 81, phases: int = 1,
+             data_type: str = "refl", freq_start: float = 10500, freq_step: float = 5,
+             dx: float = 2, num_pts_norm: int = 20, noise: float = 0.02,
+             seed: int = 0) -> SyntheticTrace:
+    freqs, length, body, mu = synthesize(points, n_freqs, phases, data_type, freq_start, freq_step,
+                                         dx, num_pts_norm, noise, seed)
+    rows = points * phases
+
+    stamp = datetime(2025, 4, 2, 16, 55, 46) + timedelta(seconds=seed)
+    with path.open("w", encoding="utf-8") as f:
+        f.write(f"[INFO];device=UIDT;version=1.0;software=synthetic;vendor=benchmarks;"
+                f"date={stamp:%d/%m/%y};time={stamp:%H:%M:%S}\n")
+        f.write(f"[REFLECT];points={rows};summ_count=50000;datarate={phases};decimation=0;\n")
+        f.write("[LASER];period=80600ns;duration=80ns;delay=2000ns;\n")
+        f.write(f"[FREQ];start={freqs[0]:g};end={freqs[-1]:g};step={freq_step:g};\n")
+        f.write(f"Point distances(m) [0, {rows - 1}]=;" + ";".join(f"{d:.4f}" for d in length) + "\n")
+        f.write("Length:;" + ";".join(f"f(MHz)={fr:g}" for fr in freqs) + "\n")
+        np.savetxt(f, np.column_stack((length, body)), fmt=["%.4f"] + ["%.5f"] * n_freqs,
+                   delimiter=";", newline=";\n")
+
+    f0 = np.repeat(mu.mean(axis=1), phases)
+    return SyntheticTrace(path, data_type, points, freqs.astype(np.float32), phases, dx, f0, num_pts_norm)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--points", type=int, default=1500)
+    parser.add_argument("--freqs", type=int, default=81)
+    parser.add_argument("--phases", type=int, default=1)
+    parser.add_argument("--data-type", choices=["refl", "analyze"], default="refl")
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for i in range(args.files):
+        trace = generate(args.output / f"synthetic_{args.data_type}_{i:04d}.csv", args.points, args.freqs,
+                         args.phases, args.data_type, seed=args.seed + i)
+        np.save(trace.path.with_suffix(".f0.npy"), trace.f0)
+        print(trace.path)
+
+
+if __name__ == "__main__":
+    main()
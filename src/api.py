@@ -0,0 +1,73 @@
+"""Обработка данных УИДТ из программы, без файлов.
+
+    header = {"freqs": freqs, "dx": 2, "datarate": 1}
+    result = process_trace(header, data, AppParams(data_type="analyze"))
+    result.f0, result.length, result.stats
+
+data - строки рефлектограммы (точки линии, частоты), как в теле файла без столбца длины.
+Для потока данных с одинаковыми параметрами лучше один раз создать make_processor(params)
+и передавать его в process_trace: пул процессов и буферы создаются один раз,
+работает warm_start.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from src.initializer.initializer import AppParams
+from src.processing.processor import FileResult, Processor
+from src.reader.trace_reader import Trace, TraceHeader
+
+
+def make_trace(header: dict, data: np.ndarray) -> Trace:
+    """Trace из заголовка и строк.
+
+    Ключи header: freqs - частоты, МГц (обязательно); distances - расстояния точек, м,
+    или dx - шаг по расстоянию (по умолчанию 1); datarate - количество сдвигов фазы
+    (по умолчанию 1); date (дд/мм/гг), time (чч:мм:сс) - время записи для архива пиков.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    freqs = np.asarray(header["freqs"], dtype=np.float32)
+    if data.ndim != 2 or data.shape[1] != freqs.size:
+        raise ValueError(f"Ожидались строки ({freqs.size} частот), получен массив {data.shape}")
+    if "distances" in header:
+        distances = np.asarray(header["distances"], dtype=float)
+    else:
+        distances = float(header.get("dx", 1)) * np.arange(data.shape[0])
+    if distances.size != data.shape[0]:
+        raise ValueError(f"Расстояний {distances.size}, а строк {data.shape[0]}")
+
+    trace_header = TraceHeader(
+        date=str(header.get("date", "")),
+        time=str(header.get("time", "")),
+        points=data.shape[0],
+        summ_count=int(header.get("summ_count", 0)),
+        datarate=int(header.get("datarate", 1)),
+        freq_start=float(freqs[0]),
+        freq_end=float(freqs[-1]),
+        freq_step=float(freqs[1] - freqs[0]) if freqs.size > 1 else 0.0,
+        distances=distances,
+        freqs=freqs,
+        header_rows=0,
+    )
+    # Порядок F, как у TraceReader: от него зависит нормировка в float32
+    body = np.asfortranarray(np.column_stack((distances.astype(np.float32), data)))
+    return Trace(trace_header, body)
+
+
+def make_processor(params: AppParams | None = None, output_root: Path | None = None) -> Processor:
+    """Processor без графиков, кэша и журнала метрик"""
+    params = (params or AppParams()).model_copy(update={"plots": False, "metrics": False})
+    return Processor(params, "off", output_root)
+
+
+def process_trace(header: dict, data: np.ndarray, params: AppParams | None = None,
+                  processor: Processor | None = None, name: str = "trace") -> FileResult:
+    """Частоты пиков f0, длина участка и скользящие статистики. Файлы не читаются и не пишутся"""
+    trace = make_trace(header, data)
+    if processor is not None:
+        return processor.analyze_trace(trace, name)
+    processor = make_processor(params)
+    try:
+        return processor.analyze_trace(trace, name)
+    finally:
+        processor.close()
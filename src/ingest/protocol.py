@@ -0,0 +1,71 @@
+"""Двоичные кадры для передачи рефлектограмм без CSV.
+
+Кадр: 4 байта b"UIDT", длина заголовка (uint32, little-endian), заголовок - JSON в UTF-8,
+затем данные - rows * columns чисел float32 little-endian по строкам.
+В заголовке обязательны rows и columns, остальные ключи - как у header в src.api.make_trace
+(freqs, dx или distances, datarate, date, time) и name - имя для таблицы пиков.
+"""
+import json
+import struct
+from typing import BinaryIO
+
+import numpy as np
+
+MAGIC = b"UIDT"
+_LENGTH = struct.Struct("<I")
+_DTYPE = np.dtype("<f4")
+
+
+class FrameError(ValueError):
+    """Поток не соответствует формату кадров"""
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    chunks, left = [], size
+    while left:
+        chunk = stream.read(left)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        left -= len(chunk)
+    return b"".join(chunks)
+
+
+def encode_frame(header: dict, data: np.ndarray) -> bytes:
+    data = np.ascontiguousarray(data, dtype=_DTYPE)
+    if data.ndim != 2:
+        raise ValueError(f"Ожидался двумерный массив, получен {data.shape}")
+    header = {**header, "rows": data.shape[0], "columns": data.shape[1]}
+    for key, value in header.items():
+        if isinstance(value, np.ndarray):
+            header[key] = value.tolist()
+    meta = json.dumps(header).encode()
+    return MAGIC + _LENGTH.pack(len(meta)) + meta + data.tobytes()
+
+
+def write_frame(stream: BinaryIO, header: dict, data: np.ndarray) -> None:
+    stream.write(encode_frame(header, data))
+    stream.flush()
+
+
+def read_frame(stream: BinaryIO) -> tuple[dict, np.ndarray] | None:
+    """Следующий кадр или None, если поток закончился между кадрами"""
+    prefix = _read_exact(stream, len(MAGIC) + _LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < len(MAGIC) + _LENGTH.size or prefix[:len(MAGIC)] != MAGIC:
+        raise FrameError("Неверное начало кадра")
+    (meta_size,) = _LENGTH.unpack(prefix[len(MAGIC):])
+    meta = _read_exact(stream, meta_size)
+    if len(meta) < meta_size:
+        raise FrameError("Поток оборвался в заголовке кадра")
+    try:
+        header = json.loads(meta)
+        shape = (int(header["rows"]), int(header["columns"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise FrameError(f"Неверный заголовок кадра: {e}") from e
+    size = shape[0] * shape[1] * _DTYPE.itemsize
+    payload = _read_exact(stream, size)
+    if len(payload) < size:
+        raise FrameError("Поток оборвался в данных кадра")
+    return header, np.frombuffer(payload, dtype=_DTYPE).reshape(shape)
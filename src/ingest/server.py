@@ -0,0 +1,81 @@
+import socket
+import stat
+import sys
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from src.api import make_trace
+from src.ingest.protocol import FrameError, read_frame, write_frame
+from src.processing.processor import Processor
+
+
+class IngestServer:
+    """Приём рефлектограмм кадрами (src.ingest.protocol) из stdin или локального сокета.
+
+    Каждый кадр обрабатывается Processor.analyze_trace и передаётся в Processor.commit:
+    пики дописываются в таблицу, как для файлов, но текст не пишется и не разбирается.
+    По сокету в ответ на кадр отправляется кадр с name и строками (длина, f0).
+    Клиенты сокета обслуживаются по очереди, warm_start работает между кадрами.
+    """
+
+    def __init__(self, processor: Processor, source: str) -> None:
+        """source - "-" для stdin или путь до Unix-сокета"""
+        self.processor = processor
+        self.source = source
+        self.count = 0
+
+    def _handle(self, header: dict, data: np.ndarray) -> tuple[str, np.ndarray]:
+        self.count += 1
+        name = str(header.get("name", f"frame_{self.count:06d}"))
+        result = self.processor.analyze_trace(make_trace(header, data), name)
+        self.processor.commit(result)
+        return name, np.column_stack((result.length, result.f0))
+
+    def _serve_stream(self, stream: BinaryIO, reply: BinaryIO | None = None) -> None:
+        while True:
+            try:
+                frame = read_frame(stream)
+            except FrameError as e:
+                print(f"Ошибка приёма: {e}")
+                return
+            if frame is None:
+                return
+            try:
+                name, peaks = self._handle(*frame)
+            except Exception as e:
+                # Ошибка в одном кадре (неверный заголовок, слишком короткая линия) не останавливает приём
+                print(f"Кадр {self.count} пропущен: {e!r}")
+                if reply is not None:
+                    write_frame(reply, {"error": str(e)}, np.empty((0, 2), np.float32))
+                continue
+            print(f"Обработан кадр {name}")
+            if reply is not None:
+                write_frame(reply, {"name": name}, peaks)
+            self.processor.flush_if_due()
+
+    def serve(self) -> None:
+        """Приём до конца stdin или до Ctrl + C"""
+        if self.source == "-":
+            self._serve_stream(sys.stdin.buffer)
+            return
+        path = Path(self.source)
+        # Удаляем только сокет, оставшийся от прошлого запуска, но не файл, указанный по ошибке
+        if path.exists() and not stat.S_ISSOCK(path.stat().st_mode):
+            raise FileExistsError(f"{path} существует и не является сокетом")
+        path.unlink(missing_ok=True)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(str(path))
+            server.listen()
+            print(f"Ожидание данных на {path}")
+            try:
+                while True:
+                    conn, _ = server.accept()
+                    try:
+                        with conn, conn.makefile("rb") as reader, conn.makefile("wb") as writer:
+                            self._serve_stream(reader, writer)
+                    except OSError as e:
+                        print(f"Соединение прервано: {e}")
+            finally:
+                path.unlink(missing_ok=True)
@@ -4,7 +4,12 @@ class CommandLineParser:
     def __init__(self):
         self.parser = argparse.ArgumentParser(description="--path путь до папки с данными\n" \
         "--params путь до файла с параметрами" \
-        "--monitor выполнить обработку единожды всех файлов или обрабатывать только новые файлы")
+        "--monitor выполнить обработку единожды всех файлов или обрабатывать только новые файлы\n" \
+        "--cache режим кэша разобранных файлов on / off (по умолчанию) / rebuild\n" \
+        "--jobs количество файлов, обрабатываемых одновременно (и в режиме мониторинга)\n" \
+        "--profile вывести в конце время по этапам обработки\n" \
+        "--sweep файл с вариантами параметров для перебора\n" \
+        "--ingest приём данных из stdin (-) или локального сокета вместо файлов")
         self._setup_arguments()
 
     def _str2bool(self, v):
@@ -26,7 +31,51 @@ class CommandLineParser:
         self.parser.add_argument("--monitor", type=self._str2bool, required=False, default='n',
                         help="Выполнять мониторинг папки. true - мониторим папку," \
                         " false - обрабатывает то, что уже есть.")
+        self.parser.add_argument("--cache", type=str, required=False, default="off",
+                                 choices=["on", "off", "rebuild"],
+                                 help="Кэш разобранных файлов в папке .cache. on - использовать," \
+                                 " off - не использовать, rebuild - перечитать файлы и обновить кэш")
+        self.parser.add_argument("--jobs", type=int, required=False, default=1,
+                                 help="Количество файлов, обрабатываемых одновременно в отдельных процессах")
+        self.parser.add_argument("--profile", type=self._str2bool, required=False, default='n',
+                                 help="Вывести при завершении сводку времени по этапам обработки")
+        self.parser.add_argument("--sweep", type=str, required=False, default=None,
+                                 help="Путь до файла с вариантами параметров. Каждый файл читается один раз"
+                                 " и обрабатывается со всеми вариантами, результаты - в папке Sweep")
+        self.parser.add_argument("--ingest", type=str, required=False, default=None,
+                                 help="Принимать данные двоичными кадрами: - из stdin или путь до Unix-сокета."
+                                 " Пики сохраняются в папку Peaks в --path")
 
     def parse(self):
         return self.parser.parse_args()
-    
\ No newline at end of file
+    
+
+class QueryCommandLineParser:
+    """Аргументы process-uidt query: выборка пиков из архива (параметр archive)"""
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(prog="process-uidt query",
+                                              description="Выборка f0 из архива пиков Archive")
+        self._setup_arguments()
+
+    def _setup_arguments(self):
+        self.parser.add_argument('--path', type=str, required=False, default='.',
+                                 help="Папка с архивом Archive (папка результатов обработки)")
+        self.parser.add_argument("--distance", type=float, nargs="+", required=False, default=None,
+                                 metavar=("START", "END"),
+                                 help="Расстояние в метрах или диапазон START END")
+        self.parser.add_argument("--tolerance", type=float, required=False, default=0.5,
+                                 help="Допуск в метрах, если в --distance одно значение")
+        self.parser.add_argument("--since", type=str, required=False, default=None,
+                                 help="Начало интервала времени записи, например 2025-04-02 или 2025-04-02T16:00")
+        self.parser.add_argument("--until", type=str, required=False, default=None,
+                                 help="Конец интервала времени записи (дата без времени - до конца дня)")
+        self.parser.add_argument("--session", type=str, required=False, default=None,
+                                 help="Только одна сессия (время запуска, как в имени таблицы пиков)")
+        self.parser.add_argument("--output", type=str, required=False, default=None,
+                                 help="Сохранить результат в .csv или .parquet, иначе вывести на экран")
+
+    def parse(self, argv: list[str] | None = None):
+        args = self.parser.parse_args(argv)
+        if args.distance is not None and len(args.distance) > 2:
+            self.parser.error("--distance: одно значение или диапазон START END")
+        return args
@@ -1,7 +1,10 @@
 from pathlib import Path
+from hashlib import sha1
+import json
 from pydantic import BaseModel, field_validator, Field, ValidationInfo
 import yaml
-from typing import Literal, Annotated
+from itertools import product
+from typing import Literal, Annotated, ClassVar
 
 class AppParams(BaseModel):
     inv: Literal[True, False, "auto"] = "auto"
@@ -12,7 +15,43 @@ class AppParams(BaseModel):
     num_pts_norm: int = 20
     data_type: str = "refl"
     max_std: float = 20
+    std_windows: Annotated[list[Annotated[int, Field(ge=1)]], Field(min_length=1)] = [51]
+    save_stats: bool = False
+    session_stats: bool = False
+    baseline_files: Annotated[int, Field(ge=1)] = 10
+    ewma_alpha: Annotated[float, Field(gt=0, le=1)] = 0.1
+    change_threshold: Annotated[float, Field(ge=0)] = 3
     transparency: Annotated[float, Field(ge=0, le=1)] = 0.6 
+    fit_engine: Literal["curve_fit", "batched", "loglinear", "parabolic", "centroid"] = "curve_fit"
+    fit_seed: Literal["default", "loglinear", "parabolic", "centroid"] = "default"
+    peak_detector: Literal["loop", "vectorized"] = "loop"
+    warm_start: bool = False
+    n_workers: int = -1
+    chunk_size: Annotated[int, Field(ge=1)] = 64
+    batch_rows: Annotated[int, Field(ge=1)] = 1024
+    cache_max_mb: Annotated[float, Field(ge=0)] = 2048
+    lazy_roi: bool = False
+    plots: bool = True
+    plot_dpi: Annotated[int, Field(ge=1)] = 300
+    plot_format: Literal["png", "jpg", "svg", "pdf"] = "png"
+    plot_mode: Literal["full", "fast"] = "full"
+    render_workers: Annotated[int, Field(ge=0)] = 1
+    render_queue_size: Annotated[int, Field(ge=1)] = 8
+    render_policy: Literal["block", "drop", "coalesce"] = "coalesce"
+    quiescence: Annotated[float, Field(ge=0)] = 0.3
+    monitor_queue_size: Annotated[int, Field(ge=0)] = 0
+    monitor_policy: Literal["block", "drop", "coalesce"] = "block"
+    metrics: bool = True
+    flush_every: Annotated[int, Field(ge=1)] = 10
+    flush_interval: Annotated[float, Field(ge=0)] = 30
+    archive: bool = False
+
+    # Параметры, не влияющие на результат обработки
+    RUNTIME_FIELDS: ClassVar[set[str]] = {"n_workers", "chunk_size", "batch_rows", "cache_max_mb", "lazy_roi",
+                                          "render_workers", "render_queue_size", "render_policy",
+                                          "quiescence", "monitor_queue_size", "monitor_policy",
+                                          "metrics", "flush_every", "flush_interval", "archive", "session_stats",
+                                          "baseline_files", "ewma_alpha", "change_threshold"}
     
     @field_validator('point_start')
     def validate_point_start(cls, v: float, info: ValidationInfo) -> float:
@@ -29,6 +68,11 @@ class AppParams(BaseModel):
         if 'point_cut' in info.data and v < info.data['point_cut']:
             raise ValueError("Конец не может быть левее среза.")
         return v
+
+    def fingerprint(self) -> str:
+        """Хэш параметров, влияющих на результат обработки"""
+        data = self.model_dump(mode='json', exclude=self.RUNTIME_FIELDS)
+        return sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
     
 class Reader:
     def __init__(self, path: Path) -> None:
@@ -39,6 +83,27 @@ class Reader:
             data = yaml.safe_load(f)
         return AppParams(**data)
     
+    def read_sweep_file(self, base: AppParams) -> dict[str, AppParams]:
+        """Варианты параметров для перебора: base, изменённые по каждой точке сетки grid
+        (все сочетания значений) и по каждому элементу списка variants.
+        Имя варианта - name элемента variants (или, если его нет, изменённые им параметры)
+        и значения параметров сетки. Варианты с одинаковыми именами - ошибка"""
+        with self.path.open() as f:
+            data = yaml.safe_load(f) or {}
+        grid = data.get("grid", {})
+        variants = data.get("variants") or [{}]
+        result = {}
+        for values in product(*grid.values()):
+            for variant in variants:
+                update = {**dict(zip(grid, values)), **variant}
+                name = update.pop("name", "")
+                named = [*zip(grid, values)] if name else update.items()
+                name = "_".join([name] * bool(name) + [f"{k}={v}".replace(" ", "") for k, v in named]) or "base"
+                if name in result:
+                    raise ValueError(f"Повторяющееся имя варианта {name} в {self.path}")
+                result[name] = AppParams(**{**base.model_dump(), **update})
+        return result
+
     def write_default_init_file(self) -> AppParams:
         config = AppParams()
         data = config.model_dump(mode='json', exclude_none=True)
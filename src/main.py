@@ -1,46 +1,142 @@
-from time import sleep
+from datetime import datetime, timedelta
+from time import perf_counter, sleep
 from pathlib import Path
+import sys
+
+from src.initializer.argparser import CommandLineParser, QueryCommandLineParser
+
+# Обработка, графики и мониторинг импортируются в main по мере надобности:
+# --help и создание шаблона параметров не загружают scipy, matplotlib, polars и watchdog
+
+
+def _parse_time(value: str | None, end: bool = False) -> datetime | None:
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value)
+    # Дата без времени в --until - включительно до конца дня
+    if end and len(value) <= 10:
+        moment += timedelta(days=1, microseconds=-1)
+    return moment
+
+
+def query(argv: list[str]) -> None:
+    from src.saver.peak_archive import PeakArchive
+
+    args = QueryCommandLineParser().parse(argv)
+    distance_from = distance_to = None
+    if args.distance is not None:
+        distance_from, distance_to = (args.distance if len(args.distance) == 2 else
+                                      (args.distance[0] - args.tolerance, args.distance[0] + args.tolerance))
+    archive = Path(args.path) / PeakArchive.DIR_NAME
+    if not archive.is_dir():
+        print(f"Архив {archive} не найден")
+        return
+
+    start = perf_counter()
+    peaks = PeakArchive.query(archive, distance_from, distance_to,
+                              _parse_time(args.since), _parse_time(args.until, end=True), args.session)
+    print(f"Найдено {peaks.height} значений за {perf_counter() - start:.3f} с")
+    if args.output is None:
+        print(peaks)
+    elif args.output.endswith(".parquet"):
+        peaks.write_parquet(args.output)
+    else:
+        peaks.write_csv(args.output, separator=";")
 
-from src.observer.observer import AsyncFileHandler, Watcher, OnceFileHandler
-from src.processing.processor import Processor
-from src.initializer.initializer import Reader
-from src.initializer.argparser import CommandLineParser
 
 def main():
+    if sys.argv[1:2] == ["query"]:
+        query(sys.argv[2:])
+        return
+
     parser = CommandLineParser()
     args = parser.parse()
+    from src.initializer.initializer import Reader
 
     if (Path(args.path) / args.params).is_file():
         params = Reader(Path(args.path) / args.params).read_init_file()
     else:
         params = Reader(Path(args.path) / "params.yaml").write_default_init_file()
     
-    processor = Processor(params)
+    if args.sweep is not None:
+        from src.observer.observer import OnceFileHandler
+        from src.processing.sweep import SweepRunner
+        variants = Reader(Path(args.sweep)).read_sweep_file(params)
+        sweep = SweepRunner(variants, Path(args.path) / "Sweep", args.cache)
+        sweep.process_files(OnceFileHandler._get_fnames(Path(args.path)))
+        sweep.save()
+        sweep.close()
+        return
+
+    if args.ingest is not None:
+        from src.api import make_processor
+        from src.ingest.server import IngestServer
+        processor = make_processor(params, Path(args.path))
+        try:
+            IngestServer(processor, args.ingest).serve()
+        except KeyboardInterrupt:
+            print("\nЗавершение работы...")
+        finally:
+            # Принятые кадры сохраняются и при ошибке сервера
+            processor.save()
+            processor.close()
+        return
+
+    from src.observer.observer import AsyncFileHandler, Watcher, OnceFileHandler, file_time
+    from src.processing.processor import Processor
+    from src.processing.batch import BatchProcessor
+    if not args.monitor:
+        # Отбрасывать графики допустимо только при мониторинге, без него очередь ждёт отрисовки
+        params = params.model_copy(update={"render_policy": "block"})
+    processor = Processor(params, args.cache)
 
     if not args.monitor:
-        OnceFileHandler(processor.process_file).process_directory(Path(args.path))
-        processor.saver.save_file()
+        if args.jobs > 1:
+            BatchProcessor(processor, params, args.jobs, args.cache).process_files(
+                OnceFileHandler._get_fnames(Path(args.path)))
+        else:
+            OnceFileHandler(processor.process_file).process_directory(Path(args.path))
+        processor.save()
+        processor.close()
+        if args.profile:
+            print(processor.metrics_log.report())
         return
 
+    # Несколько обработчиков - отдельные процессы, основной процесс только сохраняет результаты
+    batch = BatchProcessor(processor, params, args.jobs, args.cache) if args.jobs > 1 else None
     async_handler = AsyncFileHandler(
-        callback=processor.process_file,
-        max_workers=1
+        callback=batch.analyze if batch is not None else processor.restore_or_analyze,
+        max_workers=args.jobs,
+        commit=processor.commit,
+        maxsize=params.monitor_queue_size,
+        policy=params.monitor_policy,
     )
 
     watcher = Watcher(
         watch_path=Path(args.path),
         callback=async_handler.add_file,
+        quiescence=params.quiescence,
     )
     watcher.start()
+    # Файлы, появившиеся до запуска мониторинга, по времени записи. Уже обработанные пропускаются по журналу
+    for fname in sorted(OnceFileHandler._get_fnames(Path(args.path)), key=file_time):
+        async_handler.add_file(fname)
 
     try:
         while True:
             sleep(1)
+            processor.flush_if_due()
     except KeyboardInterrupt:
         print("\nЗавершение работы...")
-        processor.saver.save_file()
         watcher.stop()
+        # Дообрабатываем файлы, которые уже в очереди
         async_handler.stop()
+        if batch is not None:
+            batch.close()
+        processor.save()
+        processor.close()
+        if args.profile:
+            print(processor.metrics_log.report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
+import functools
+import json
+import threading
+
+# Метрики файла, который сейчас обрабатывается в этом потоке
+_local = threading.local()
+
+
+@dataclass
+class Metrics:
+    """Время этапов (секунды) и счётчики обработки одного файла"""
+    timings: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+@contextmanager
+def collect(metrics: Metrics | None = None) -> Iterator[Metrics]:
+    """Все timer и count внутри блока (в этом потоке) записываются в metrics"""
+    metrics = metrics if metrics is not None else Metrics()
+    prev = getattr(_local, "metrics", None)
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = prev
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    """Время выполнения блока. Вне collect ничего не записывается"""
+    metrics = getattr(_local, "metrics", None)
+    if metrics is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(stage, perf_counter() - start)
+
+
+def timed(stage: str) -> Callable:
+    """Декоратор: время каждого вызова функции записывается в этап stage"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, n: int = 1) -> None:
+    metrics = getattr(_local, "metrics", None)
+    if metrics is not None and n:
+        metrics.count(name, int(n))
+
+
+class MetricsLog:
+    """Журнал метрик Peaks/metrics.jsonl и сводка по этапам для --profile.
+
+    Для сводки хранятся только количество, сумма и максимум по каждому этапу,
+    поэтому память не растёт при долгом мониторинге.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.timings: dict[str, list[float]] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, path: Path, kind: str, metrics: Metrics, output_dir: Path | None = None) -> None:
+        """Учёт метрик файла path. Журнал пишется в output_dir, по умолчанию - в Peaks рядом с файлом"""
+        with self._lock:
+            for stage, seconds in metrics.timings.items():
+                total = self.timings.setdefault(stage, [0, 0, 0])
+                total[0] += 1
+                total[1] += seconds
+                total[2] = max(total[2], seconds)
+            for name, n in metrics.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+            if not self.enabled:
+                return
+            record = {
+                "time": datetime.now().isoformat(timespec="milliseconds"),
+                "file": path.name,
+                "kind": kind,
+                "timings": {k: round(v, 6) for k, v in metrics.timings.items()},
+                "counters": metrics.counters,
+            }
+            output_dir = output_dir or path.parent / "Peaks"
+            output_dir.mkdir(exist_ok=True)
+            with (output_dir / "metrics.jsonl").open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def report(self) -> str:
+        with self._lock:
+            lines = [f"{'Этап':<24}{'Раз':>8}{'Всего, с':>12}{'Среднее, мс':>14}{'Макс, мс':>12}"]
+            for stage, (n, total, longest) in sorted(self.timings.items(), key=lambda item: -item[1][1]):
+                lines.append(f"{stage:<24}{n:>8}{total:>12.3f}{total / n * 1e3:>14.1f}{longest * 1e3:>12.1f}")
+            for name, n in sorted(self.counters.items()):
+                lines.append(f"{name}: {n}")
+        return "\n".join(lines)
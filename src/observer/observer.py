@@ -1,19 +1,58 @@
-from typing import Callable
+from datetime import datetime
+from time import monotonic
+from typing import Any, Callable
 from pathlib import Path
 
-import queue
+import heapq
 import threading
-from watchdog.observers import Observer
-from watchdog.events import PatternMatchingEventHandler
 
 from os import listdir
 
+from src.reader.trace_reader import TraceReader
+
+def file_time(path: Path) -> datetime:
+    """Время записи файла УИДТ из [INFO], если его нет - время изменения файла"""
+    try:
+        with path.open() as f:
+            moment = TraceReader().read_header(f).timestamp
+        return moment if moment is not None else datetime.fromtimestamp(path.stat().st_mtime)
+    except (OSError, ValueError, KeyError):
+        # Файл с ошибкой обработается первым и будет пропущен в callback
+        return datetime.min
+
+
 class AsyncFileHandler:
-    # TODO: сделать сверку файлов в Figures и целевой папке. Недостающие закинуть в очередь. Можно и в основном потоке
-    def __init__(self, callback: Callable, max_workers: int=1) -> None:
-        self.file_queue: queue.Queue[Path] = queue.Queue()
+    """Обработка файлов в max_workers потоках с ограниченной очередью.
+
+    Ожидающие файлы упорядочены по времени записи (key, по умолчанию file_time):
+    обработчики берут самый ранний, commit(result) вызывается строго в порядке,
+    в котором файлы взяты в обработку, даже если обработались они в другом порядке.
+    Поэтому результаты сохраняются по времени записи файлов, кроме файла, который
+    появился позже, чем более поздний по времени файл уже взят в обработку: его
+    результат сохраняется после. Если в очереди уже maxsize файлов (0 - без ограничения),
+    policy определяет, что делать: "block" - ждать освобождения места,
+    "drop" - пропустить новый файл, "coalesce" - пропустить самый ранний ожидающий.
+    """
+    def __init__(self, callback: Callable, max_workers: int=1, commit: Callable | None=None,
+                 maxsize: int=0, policy: str="block", key: Callable[[Path], Any] = file_time) -> None:
         self.callback = callback
-        self._stop_event = threading.Event()
+        self.commit = commit
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key
+        self.dropped = 0
+
+        # Куча (время записи, номер добавления, путь, момент добавления)
+        self._pending: list[tuple[Any, int, Path, float]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._added = 0
+        # Номер следующего взятого в обработку файла и следующего файла для commit
+        self._next_seq = 0
+        self._next_commit = 0
+        self._done: dict[int, Any] = {}
+        self._enqueued: dict[int, float] = {}
+        self._commit_lock = threading.Lock()
         
         self.workers = [
             threading.Thread(
@@ -25,29 +64,100 @@ class AsyncFileHandler:
         for w in self.workers:
             w.start()
 
+    @property
+    def depth(self) -> int:
+        """Количество добавленных, но ещё не сохранённых файлов"""
+        with self._cond:
+            return len(self._pending) + self._next_seq - self._next_commit
+
+    @property
+    def lag(self) -> float:
+        """Сколько секунд ждёт самый старый несохранённый файл"""
+        with self._cond:
+            times = [*self._enqueued.values(), *(item[3] for item in self._pending)]
+            return monotonic() - min(times) if times else 0
+
     def add_file(self, file_path: Path) -> None:
         """Добавление файла в очередь обработки"""
-        self.file_queue.put(file_path)
+        # Заголовок файла читается до захвата блокировки
+        key = self.key(file_path)
+        with self._cond:
+            if self._closed:
+                return
+            self._added += 1
+            item = (key, self._added, file_path, monotonic())
+            if self.maxsize and len(self._pending) >= self.maxsize:
+                if self.policy == "block":
+                    self._cond.wait_for(lambda: len(self._pending) < self.maxsize or self._closed)
+                    if self._closed:
+                        # Обработчики остановлены, пока ждали места в очереди
+                        print(f"Обработка остановлена, пропускаем {file_path}")
+                        return
+                elif self.policy == "drop":
+                    self.dropped += 1
+                    print(f"Очередь обработки заполнена, пропускаем {file_path}")
+                    return
+                else:
+                    # Самый ранний из ожидающих, включая новый файл
+                    old = heapq.heappushpop(self._pending, item)
+                    self.dropped += 1
+                    print(f"Очередь обработки заполнена, пропускаем {old[2]}")
+                    self._cond.notify_all()
+                    return
+            heapq.heappush(self._pending, item)
+            self._cond.notify_all()
 
     def _process_files(self) -> None:
         """Внутренний обработчик (работает в отдельных потоках)"""
-        while not self._stop_event.is_set():
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                _, _, file_path, enqueued = heapq.heappop(self._pending)
+                seq = self._next_seq
+                self._next_seq += 1
+                self._enqueued[seq] = enqueued
+                self._cond.notify_all()
+            result = None
             try:
-                file_path = self.file_queue.get(timeout=1)
-                try:
-                    self.callback(file_path)
-                except Exception as e:
-                    print(f"Ошибка обработки {file_path}: {str(e)}")
-                finally:
-                    self.file_queue.task_done()
-            except queue.Empty:
-                continue
-
-    def stop(self) -> None:
-        """Корректная остановка обработчиков"""
-        self._stop_event.set()
+                result = self.callback(file_path)
+            except Exception as e:
+                print(f"Ошибка обработки {file_path}: {str(e)}")
+            with self._cond:
+                self._done[seq] = result
+            self._commit_ready()
+
+    def _commit_ready(self) -> None:
+        """commit всех обработанных файлов, перед которыми нет необработанных"""
+        with self._commit_lock:
+            while True:
+                with self._cond:
+                    if self._next_commit not in self._done:
+                        return
+                    result = self._done.pop(self._next_commit)
+                if result is not None and self.commit is not None:
+                    try:
+                        self.commit(result)
+                    except Exception as e:
+                        print(f"Ошибка сохранения {result.path}: {str(e)}")
+                with self._cond:
+                    self._enqueued.pop(self._next_commit, None)
+                    self._next_commit += 1
+                    self._cond.notify_all()
+                if self.depth:
+                    print(f"В очереди {self.depth} файлов, задержка {self.lag:.1f} с")
+
+    def stop(self, drain: bool=True) -> None:
+        """Остановка обработчиков. При drain оставшиеся в очереди файлы обрабатываются"""
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self._pending.clear()
+            self._cond.notify_all()
         for w in self.workers:
-            w.join(timeout=5)
+            w.join()
+        self._commit_ready()
 
 class OnceFileHandler:
     def __init__(self, callback: Callable) -> None:
@@ -55,10 +165,16 @@ class OnceFileHandler:
     
     @staticmethod
     def _get_fnames(path: Path) -> list:
+        """Файлы .csv папки, запись которых закончена (TraceReader.is_complete)"""
         fnames_all = listdir(path)
         fnames = []
-        for fname in fnames_all:
+        reader = TraceReader()
+        for fname in sorted(fnames_all):
             if fname.split(".")[-1] == "csv":
+                if not reader.is_complete(path / fname):
+                    # В режиме мониторинга файл будет обработан, когда его допишут
+                    print(f"Файл {path / fname} не дописан, пропускаем")
+                    continue
                 fnames.append(path / fname)
         return fnames
 
@@ -69,23 +185,73 @@ class OnceFileHandler:
         
 
 class Watcher:
-    def __init__(self, watch_path, callback):
+    """Мониторинг папки: файл передаётся в callback, только когда его запись закончена.
+
+    Файл проверяется, когда в течение quiescence секунд для него не было событий
+    создания, изменения и закрытия (on_closed, есть только в Linux): прибор может
+    закрывать и снова открывать файл между порциями записи. Для каждого файла свой
+    таймер, новое событие перезапускает его. Файл передаётся в callback, если его
+    последняя строка дописана и относится к последней точке линии
+    (TraceReader.is_complete, читается только хвост файла), иначе ждём следующих событий.
+    """
+    def __init__(self, watch_path, callback, quiescence: float = 0.3):
+        # watchdog нужен только в режиме мониторинга
+        from watchdog.observers import Observer
         self.observer = Observer()
+        self.quiescence = quiescence
+        self._timers: dict[Path, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._reader = TraceReader()
         handler = self._create_handler(callback)
         self.observer.schedule(handler, watch_path, recursive=True)
 
+    def _schedule(self, path: Path, callback: Callable, delay: float) -> None:
+        def fire():
+            with self._lock:
+                if self._timers.get(path) is not timer:
+                    return
+                del self._timers[path]
+            if not self._reader.is_complete(path):
+                print(f"Файл {path} не дописан, ждём продолжения записи")
+                return
+            callback(path)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            old = self._timers.get(path)
+            if old is not None:
+                old.cancel()
+            self._timers[path] = timer
+        timer.start()
+
     def _create_handler(self, callback):
+        from watchdog.events import PatternMatchingEventHandler
+        watcher = self
+
         class Handler(PatternMatchingEventHandler):
             def __init__(self):
                 super().__init__(
                     patterns=["*.csv"],
+                    # Результаты обработки тоже .csv, их не обрабатываем
+                    ignore_patterns=["*/Peaks/*", "*/Figures/*", "*/.cache/*"],
                     ignore_directories=True,
                     case_sensitive=False,
                 )
             
             def on_created(self, event):
-                if not event.is_directory:
-                    callback(Path(event.src_path)) # type: ignore
+                watcher._schedule(Path(event.src_path), callback, watcher.quiescence) # type: ignore
+
+            def on_modified(self, event):
+                watcher._schedule(Path(event.src_path), callback, watcher.quiescence) # type: ignore
+
+            def on_moved(self, event):
+                # Файл записали под временным именем и переименовали
+                if Path(event.dest_path).suffix.lower() == ".csv": # type: ignore
+                    watcher._schedule(Path(event.dest_path), callback, 0) # type: ignore
+
+            def on_closed(self, event):
+                watcher._schedule(Path(event.src_path), callback, watcher.quiescence) # type: ignore
         return Handler()
 
     def start(self):
@@ -94,3 +260,7 @@ class Watcher:
     def stop(self):
         self.observer.stop()
         self.observer.join()
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
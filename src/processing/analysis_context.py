@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class AnalysisContext:
+    """Данные одного файла, общие для всех этапов поиска пиков.
+
+    Нормировка и положения пиков считаются один раз при создании, а параметры
+    аппроксимации (mu, b, a) каждой строки сохраняются в params: по ним строятся
+    аппроксимирующие кривые без повторной аппроксимации. Для "analyze" используется
+    params[:, 0], для "refl" - левый и правый пик. NaN - строка не аппроксимирована
+    или аппроксимация не удалась.
+    """
+    freq: np.ndarray
+    data: np.ndarray
+    lo_peaks: np.ndarray | None = None
+    hi_peaks: np.ndarray | None = None
+    params: np.ndarray = field(init=False)
+    fitted: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.params = np.full((self.data.shape[0], 2, 3), np.nan)
+        self.fitted = np.zeros(self.data.shape[0], dtype=bool)
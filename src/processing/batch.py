@@ -0,0 +1,67 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+import signal
+
+from src.initializer.initializer import AppParams
+from src.processing.processor import FileResult, Processor
+
+# Processor процесса-обработчика, создаётся один раз при запуске процесса
+_worker_processor: Processor | None = None
+
+
+def _init_worker(params: AppParams, cache_mode: str) -> None:
+    global _worker_processor
+    # Ctrl+C обрабатывает основной процесс, иначе обработчики завершатся, не доделав очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Файлы и так обрабатываются параллельно, вложенные пулы не нужны
+    _worker_processor = Processor(params.model_copy(update={"n_workers": 1, "render_workers": 0}), cache_mode)
+
+
+def _analyze(path: Path) -> FileResult:
+    assert _worker_processor is not None
+    return _worker_processor.analyze_file(path)
+
+
+class BatchProcessor:
+    """Параллельная обработка папки: jobs файлов одновременно в пуле процессов.
+
+    Результаты передаются в PeakSaver основного процесса строго в порядке имён файлов,
+    поэтому итоговый файл с пиками не зависит от того, какой файл обработался первым.
+    В режиме мониторинга пул используется через analyze из потоков AsyncFileHandler.
+    """
+
+    def __init__(self, processor: Processor, params: AppParams, jobs: int, cache_mode: str = "off") -> None:
+        self.processor = processor
+        self.params = params
+        self.jobs = jobs
+        self.cache_mode = cache_mode
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _make_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                   initargs=(self.params, self.cache_mode))
+
+    def analyze(self, path: Path) -> FileResult:
+        """Результат из журнала или обработка файла в пуле процессов"""
+        if self._executor is None:
+            self._executor = self._make_executor()
+        restored = self.processor.lookup_processed(path)
+        return restored if restored is not None else self._executor.submit(_analyze, path).result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def process_files(self, fnames: list[Path]) -> None:
+        with self._make_executor() as executor:
+            results: list[FileResult | Future[FileResult]] = []
+            for fname in sorted(fnames):
+                restored = self.processor.lookup_processed(fname)
+                results.append(restored if restored is not None else executor.submit(_analyze, fname))
+
+            for fname, result in zip(sorted(fnames), results):
+                try:
+                    self.processor.commit(result if isinstance(result, FileResult) else result.result())
+                except Exception as e:
+                    print(f"Ошибка обработки {fname}: {str(e)}")
@@ -0,0 +1,29 @@
+import threading
+
+import numpy as np
+
+
+class BufferPool:
+    """Рабочие массивы предобработки, переиспользуемые от файла к файлу.
+
+    Массив с данным именем выделяется заново, только если изменились форма, тип
+    или порядок хранения, поэтому при обработке однотипных файлов память под
+    промежуточные матрицы не перевыделяется. У каждого потока свои буферы.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def get(self, name: str, shape: tuple[int, ...], dtype: np.dtype | type = np.float32,
+            order: str = "C") -> np.ndarray:
+        buffers: dict[str, np.ndarray] = self._local.__dict__.setdefault("buffers", {})
+        buf = buffers.get(name)
+        contiguous = buf is not None and (buf.flags.f_contiguous if order == "F" else buf.flags.c_contiguous)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype or not contiguous:
+            buf = np.empty(shape, dtype=dtype, order=order) # type: ignore
+            buffers[name] = buf
+        return buf
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self._local.__dict__.get("buffers", {}).values())
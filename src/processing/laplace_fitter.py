@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class BatchedLaplaceFitter:
+    """Аппроксимация функцией Лапласа a * exp(-|x - mu| / b) сразу всех строк.
+
+    Вместо отдельного вызова curve_fit на каждую строку выполняются общие итерации
+    Левенберга-Марквардта над всем массивом. Для каждой строки свои границы
+    параметров, свой коэффициент демпфирования и своя маска сходимости:
+    сошедшиеся строки исключаются из дальнейших итераций.
+
+    Точность на файле test_path (1499 строк, шаг 5 МГц), расхождение f0 с curve_fit:
+    "analyze" - в пределах половины шага у 96% строк, больше шага у 6 строк,
+    95-й перцентиль 2.1 МГц; "refl" - в пределах половины шага у 88% строк, больше
+    шага у 95 строк (6%), 95-й перцентиль 5.8 МГц. Медианное расхождение меньше
+    1e-4 МГц. Расходятся строки с несколькими локальными минимумами, где методы
+    сходятся к разным решениям: в "refl" у 71 из 95 таких строк невязка пакетного
+    метода меньше, чем у curve_fit.
+    """
+
+    def __init__(self, max_iter: int = 100, ftol: float = 1e-8, xtol: float = 1e-8) -> None:
+        self.max_iter = max_iter
+        self.ftol = ftol
+        self.xtol = xtol
+
+    @staticmethod
+    def _model(x: np.ndarray, params: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        mu, b, a = params[:, 0:1], params[:, 1:2], params[:, 2:3]
+        diff = x[None, :] - mu
+        expo = np.exp(-np.abs(diff) / b)
+        value = a * expo
+        # Якобиан по (mu, b, a)
+        jac = np.stack((value * np.sign(diff) / b,
+                        value * np.abs(diff) / b ** 2,
+                        expo), axis=-1)
+        return value, jac
+
+    def _cost(self, x: np.ndarray, y: np.ndarray, weights: np.ndarray,
+              params: np.ndarray) -> np.ndarray:
+        value, _ = BatchedLaplaceFitter._model(x, params)
+        return ((weights * (value - y)) ** 2).sum(axis=1)
+
+    def fit(self, x: np.ndarray, y: np.ndarray, p0: np.ndarray,
+            lower: np.ndarray, upper: np.ndarray,
+            mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Аппроксимация строк y (n_rows, x.size).
+
+        p0, lower, upper имеют форму (n_rows, 3), mask (n_rows, x.size) задаёт точки,
+        участвующие в аппроксимации строки. Возвращает параметры (n_rows, 3) и признак
+        успешной аппроксимации. Неуспешными считаются строки, для которых curve_fit
+        выбросил бы исключение: начальное приближение вне границ или точек меньше,
+        чем параметров.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        weights = np.ones_like(y) if mask is None else mask.astype(np.float64)
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        params = np.array(p0, dtype=np.float64)
+
+        ok = ((params >= lower) & (params <= upper) & (lower < upper)).all(axis=1)
+        ok &= weights.sum(axis=1) >= params.shape[1]
+
+        cost = np.full(y.shape[0], np.inf)
+        lam = np.full(y.shape[0], 1e-3)
+        active = ok.copy()
+        cost[active] = self._cost(x, y[active], weights[active], params[active])
+
+        for _ in range(self.max_iter):
+            idx = np.flatnonzero(active)
+            if idx.size == 0:
+                break
+            p, w = params[idx], weights[idx]
+            value, jac = BatchedLaplaceFitter._model(x, p)
+            res = w * (value - y[idx])
+            jac *= w[..., None]
+
+            grad = np.einsum("nmi,nm->ni", jac, res)
+            # Параметры, упёршиеся в границу и тянущиеся за неё, замораживаем на этой итерации
+            frozen = ((p <= lower[idx]) & (grad > 0)) | ((p >= upper[idx]) & (grad < 0))
+            jac *= ~frozen[:, None, :]
+            grad[frozen] = 0
+
+            jtj = np.einsum("nmi,nmj->nij", jac, jac)
+            diag = np.einsum("nii->ni", jtj)
+            diag = np.where(diag > 0, diag, 1.0)
+            damped = jtj + np.einsum("ni,ij->nij", lam[idx, None] * diag, np.eye(p.shape[1]))
+            damped += np.einsum("ni,ij->nij", frozen.astype(np.float64), np.eye(p.shape[1]))
+            step = np.linalg.solve(damped, -grad[..., None])[..., 0]
+
+            p_new = np.clip(p + step, lower[idx], upper[idx])
+            cost_new = self._cost(x, y[idx], w, p_new)
+            better = cost_new < cost[idx]
+
+            small_step = (np.abs(p_new - p) <= self.xtol * (np.abs(p) + self.xtol)).all(axis=1)
+            small_gain = better & (cost[idx] - cost_new <= self.ftol * cost[idx])
+
+            params[idx[better]] = p_new[better]
+            cost[idx[better]] = cost_new[better]
+            lam[idx] = np.where(better, lam[idx] / 10, lam[idx] * 10)
+
+            converged = small_step | small_gain | (lam[idx] > 1e10)
+            active[idx[converged]] = False
+
+        ok &= np.isfinite(params).all(axis=1)
+        return params, ok
@@ -1,13 +1,36 @@
 from typing import Callable
-from joblib import Parallel, delayed
 import numpy as np
-from scipy.signal import medfilt, find_peaks
-from scipy.ndimage import convolve1d
-from scipy.optimize import curve_fit
+
+from src.metrics.metrics import count, timed, timer
+from src.processing.analysis_context import AnalysisContext
+from src.processing.closed_form import ClosedFormEstimator
+from src.processing.laplace_fitter import BatchedLaplaceFitter
+from src.processing.worker_pool import PeakWorkerPool
 
 class PeakFinder:
-    def __init__(self, data_type: str, ) -> None:
+    # Тёплый старт: допустимый сдвиг mu от начального приближения (в шагах сетки частот)
+    # и ограничение вычислений функции, при превышении - холодный старт
+    WARM_MAX_SHIFT = 10
+    WARM_MAXFEV = 100
+
+    def __init__(self, data_type: str, fit_engine: str = "curve_fit",
+                 pool: PeakWorkerPool | None = None, peak_detector: str = "loop",
+                 warm_start: bool = False, batch_rows: int = 1024, fit_seed: str = "default") -> None:
         self.data_type = data_type
+        self.fit_engine = fit_engine
+        self.peak_detector = peak_detector
+        self.warm_start = warm_start
+        self.batch_rows = batch_rows
+        # fit_engine "loglinear", "parabolic", "centroid" - оценки ClosedFormEstimator без аппроксимации,
+        # fit_seed - те же оценки как начальное приближение для "curve_fit" и "batched".
+        # Это не только ускорение: от оценки аппроксимация может сойтись к другому локальному
+        # минимуму, чем от максимума строки, поэтому f0 зашумлённых строк меняется
+        self.fit_seed = fit_seed
+        self.batched_fitter = BatchedLaplaceFitter()
+        self.estimator = ClosedFormEstimator()
+        self.pool = pool if pool is not None else PeakWorkerPool()
+        # Сетка частот и параметры аппроксимации предыдущего файла сессии
+        self._previous: tuple[np.ndarray, np.ndarray] | None = None
 
     @staticmethod
     def _laplace_func(x: np.ndarray, mu: float, b: float, a: float) -> np.ndarray:
@@ -15,6 +38,9 @@ class PeakFinder:
     
     @staticmethod
     def _get_peaks(data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        from scipy.ndimage import convolve1d
+        from scipy.signal import find_peaks
+
         image = data.T
         kernel = PeakFinder._laplace_func(np.arange(10), 5, 5, 1)
         # "Сглаживаем" сигнал с помощью функции Лапласа
@@ -38,13 +64,106 @@ class PeakFinder:
         return (low_peaks, hi_peaks)
 
     @staticmethod
-    def _process_row_analyze(freq: np.ndarray, data_row: np.ndarray, *args) -> float:
+    def _get_peaks_vectorized(data: np.ndarray, distance: int = 15) -> tuple[np.ndarray, np.ndarray]:
+        """То же, что _get_peaks, но сразу для всех точек линии, без цикла по столбцам.
+
+        Локальные максимумы (с плато, как в find_peaks) ищутся по знакам разностей,
+        первый пик - наибольший максимум, второй - наибольший из отстоящих от первого
+        не меньше чем на distance отсчётов, что совпадает с отбором find_peaks(distance=...).
+        Если пик один, оба элемента hi_peaks равны ему, а минимум берётся в середине,
+        как в _get_peaks. Если пиков нет (на таком столбце _get_peaks падает), hi_peaks = 0.
+        """
+        from scipy.ndimage import convolve1d
+
+        image = data.T
+        kernel = PeakFinder._laplace_func(np.arange(10), 5, 5, 1)
+        result = convolve1d(image, kernel, axis=0, mode='constant')
+        n, cols = result.shape
+        column = np.arange(cols)
+
+        # Знаки разностей и индекс ближайшей ненулевой разности (для плато)
+        sign = np.sign(np.diff(result, axis=0))
+        nonzero_idx = np.where(sign != 0, np.arange(n - 1)[:, None], n - 1)
+        next_nonzero = np.minimum.accumulate(nonzero_idx[::-1], axis=0)[::-1]
+        sign_ahead = np.take_along_axis(np.vstack((sign, np.zeros((1, cols)))), next_nonzero, axis=0)
+
+        # Подъём в точке i и спуск после плато - пик в середине плато
+        rows, cols_idx = np.nonzero((sign[:-1] > 0) & (sign_ahead[1:] < 0))
+        rows = rows + 1
+        peaks = np.zeros_like(result, dtype=bool)
+        peaks[(rows + next_nonzero[rows, cols_idx]) // 2, cols_idx] = True
+
+        index = np.arange(n)[:, None]
+        # При равных высотах find_peaks оставляет пик с большим индексом, поэтому argmax с конца
+        heights = np.where(peaks, result, -np.inf)
+        first = n - 1 - np.argmax(heights[::-1], axis=0)
+        has_first = peaks.any(axis=0)
+
+        far = peaks & (np.abs(index - first) >= distance)
+        second = n - 1 - np.argmax(np.where(far, result, -np.inf)[::-1], axis=0)
+        has_second = far.any(axis=0)
+
+        hi_peaks = np.zeros((cols, 2), dtype=int)
+        hi_peaks[:, 0] = np.where(has_second, second, first)
+        hi_peaks[:, 1] = first
+        hi_peaks[~has_first] = 0
+
+        # Минимум между пиками, если пика два
+        left, right = hi_peaks.min(axis=1), hi_peaks.max(axis=1)
+        between = (index >= left) & (index < right)
+        low_peaks = np.argmin(np.where(between, result, np.inf), axis=0)
+        low_peaks = np.where(has_second, low_peaks, int(data.shape[0] // 2))
+        return (low_peaks, hi_peaks[column])
+
+    def _detect_peaks(self, data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if self.peak_detector == "vectorized":
+            return PeakFinder._get_peaks_vectorized(data)
+        return PeakFinder._get_peaks(data)
+
+    @staticmethod
+    def _pick_seed(seeds: np.ndarray | None, i: int, k: int) -> np.ndarray | None:
+        """Начальное приближение k-го пика: та же строка прошлого файла (или оценка fit_seed).
+        Соседние строки не используются, иначе результат зависел бы от разбиения на куски"""
+        if seeds is not None and np.isfinite(seeds[i, k]).all():
+            return seeds[i, k]
+        return None
+
+    @staticmethod
+    def _fit_warm(x: np.ndarray, y: np.ndarray, seed: np.ndarray | None,
+                  lower: list, upper: list, step: float) -> np.ndarray | None:
+        """Аппроксимация от начального приближения seed. None, если она разошлась"""
+        if seed is None:
+            return None
+        from scipy.optimize import curve_fit
+        try:
+            params, _ = curve_fit(PeakFinder._laplace_func, x, y,
+                                  p0=np.clip(seed, lower, upper),
+                                  maxfev=PeakFinder.WARM_MAXFEV,
+                                  bounds=(lower, upper))
+        except Exception:
+            return None
+        if abs(params[0] - seed[0]) > PeakFinder.WARM_MAX_SHIFT * step:
+            return None
+        return params
+
+    @staticmethod
+    def _process_row_analyze(freq: np.ndarray, data_row: np.ndarray, i: int = 0,
+                             seeds: np.ndarray | None = None) -> np.ndarray:
+        from scipy.optimize import curve_fit
+        from scipy.signal import medfilt
+
+        params = np.full((2, 3), np.nan)
         try:
-            # ищем точку в которой пик похож на тот, что мы ожидаем
-            index_max = np.argmax(np.correlate(data_row, PeakFinder._laplace_func(np.arange(10), 5, 5, 1), mode='full')) - 5
             # сглаживаем 
             y_smooth = medfilt(data_row, kernel_size=5)
-            params, _ = curve_fit(PeakFinder._laplace_func,
+            warm = PeakFinder._fit_warm(freq, y_smooth, PeakFinder._pick_seed(seeds, i, 0),
+                                        [freq[0], 1, 0.5], [freq[-1], 100, 1.5], abs(freq[1] - freq[0]))
+            if warm is not None:
+                params[0] = warm
+                return params
+            # ищем точку в которой пик похож на тот, что мы ожидаем
+            index_max = np.argmax(np.correlate(data_row, PeakFinder._laplace_func(np.arange(10), 5, 5, 1), mode='full')) - 5
+            params[0], _ = curve_fit(PeakFinder._laplace_func,
                                   freq,
                                   y_smooth,
                                   p0=[freq[index_max], 10, 1],
@@ -52,87 +171,270 @@ class PeakFinder:
                                   bounds=([freq[0],     1,  0.5],
                                           [freq[-1],    100, 1.5]),
                                           )
-            return params[0]
         except Exception:
-            return freq[0]
+            pass
+        return params
 
     @staticmethod
     def _process_row_reflectometer(freq: np.ndarray, data_row: np.ndarray,
-                                   i: int, lo_peaks: np.ndarray, hi_peaks: np.ndarray) -> float:
+                                   i: int, lo_peaks: np.ndarray, hi_peaks: np.ndarray,
+                                   seeds: np.ndarray | None = None) -> np.ndarray:
+        from scipy.optimize import curve_fit
+
         try:
+            lo = lo_peaks[i]
+            step = abs(freq[1] - freq[0])
             # аппроксимация левого пика
-            params0, _ = curve_fit(PeakFinder._laplace_func, 
-                                freq[:lo_peaks[i]], 
-                                data_row[:lo_peaks[i]], 
-                                p0=[freq[min(hi_peaks[i])], 10, 1],
-                                maxfev=100,
-                                bounds=([freq[0],           1, 0.5],
-                                        [freq[lo_peaks[i]], 100, 1.5]))
+            params0 = PeakFinder._fit_warm(freq[:lo], data_row[:lo], PeakFinder._pick_seed(seeds, i, 0),
+                                           [freq[0], 1, 0.5], [freq[lo], 100, 1.5], step)
+            if params0 is None:
+                params0, _ = curve_fit(PeakFinder._laplace_func, 
+                                    freq[:lo], 
+                                    data_row[:lo], 
+                                    p0=[freq[min(hi_peaks[i])], 10, 1],
+                                    maxfev=100,
+                                    bounds=([freq[0], 1, 0.5],
+                                            [freq[lo], 100, 1.5]))
             # аппроксимация правого пика    
-            params1, _ = curve_fit(PeakFinder._laplace_func,
-                                freq[lo_peaks[i]:],
-                                data_row[lo_peaks[i]:],
-                                p0=[freq[max(hi_peaks[i])], 10, 1],
-                                maxfev=100,
-                                bounds=((freq[lo_peaks[i]], 1, 0.5),
-                                        (freq[-1],          100, 1.5)))
-            return (params0[0] + params1[0]) / 2
+            params1 = PeakFinder._fit_warm(freq[lo:], data_row[lo:], PeakFinder._pick_seed(seeds, i, 1),
+                                           [freq[lo], 1, 0.5], [freq[-1], 100, 1.5], step)
+            if params1 is None:
+                params1, _ = curve_fit(PeakFinder._laplace_func,
+                                    freq[lo:],
+                                    data_row[lo:],
+                                    p0=[freq[max(hi_peaks[i])], 10, 1],
+                                    maxfev=100,
+                                    bounds=((freq[lo], 1, 0.5),
+                                            (freq[-1], 100, 1.5)))
+            return np.stack((params0, params1))
         except Exception:
-            #Если что-то идёт не так, то берём среднее значение
-            return float(freq[hi_peaks[i][0]] + freq[hi_peaks[i][1]]) / 2
+            return np.full((2, 3), np.nan)
+
+    def _find_peak_parallel(self, freq: np.ndarray, process_row: Callable, data: np.ndarray, *args) -> np.ndarray:
+        return self.pool.map_rows(process_row, freq, data, *args)
+
+    @staticmethod
+    def _seed_p0(p0: np.ndarray, seed: np.ndarray | None, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        """Начальные приближения из seed там, где они есть"""
+        if seed is None:
+            return p0
+        return np.where(np.isfinite(seed).all(axis=1)[:, None], np.clip(np.nan_to_num(seed), lower, upper), p0)
+
+    def _fit_analyze_batched(self, freq: np.ndarray, data: np.ndarray,
+                             seeds: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        from scipy.signal import medfilt
+
+        kernel = PeakFinder._laplace_func(np.arange(10), 5, 5, 1)
+        padded = np.pad(data, ((0, 0), (kernel.size - 1, kernel.size - 1)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, kernel.size, axis=1)
+        index_max = np.argmax(windows @ kernel, axis=1) - 5
+        # curve_fit падал с IndexError, если индекс выходил за сетку частот
+        in_range = index_max < freq.size
+        index_max = np.where(in_range, index_max, 0)
+
+        y_smooth = medfilt(data, kernel_size=(1, 5))
+        n_rows = data.shape[0]
+        p0 = np.column_stack((freq[index_max], np.full(n_rows, 10), np.ones(n_rows)))
+        lower = np.tile([freq[0], 1, 0.5], (n_rows, 1))
+        upper = np.tile([freq[-1], 100, 1.5], (n_rows, 1))
+        p0 = PeakFinder._seed_p0(p0, None if seeds is None else seeds[:, 0], lower, upper)
+        params, ok = self.batched_fitter.fit(freq, y_smooth, p0, lower, upper)
+        return np.stack((params, np.full_like(params, np.nan)), axis=1), ok & in_range
 
     @staticmethod
-    def _find_peak_parallel(freq: np.ndarray, process_row: Callable, data: np.ndarray, *args) -> np.ndarray:
-        return np.array(Parallel(n_jobs=-1)(delayed(process_row)(freq, data[i], i, *args) for i in range(data.shape[0])))
+    def _reflectometer_bounds(freq: np.ndarray, lo_peaks: np.ndarray) -> tuple:
+        """Маска точек левого пика, границы параметров левого и правого пиков
+        и признак того, что минимум между пиками внутри сетки частот"""
+        n_rows = lo_peaks.size
+        # curve_fit падал с IndexError, если запасной минимум вышел за сетку частот
+        in_range = lo_peaks < freq.size
+        lo_peaks = np.where(in_range, lo_peaks, 0)
+        left = np.arange(freq.size)[None, :] < lo_peaks[:, None]
+        ones = np.ones(n_rows)
+        bounds0 = (np.column_stack((np.full(n_rows, freq[0]), ones, 0.5 * ones)),
+                   np.column_stack((freq[lo_peaks], 100 * ones, 1.5 * ones)))
+        bounds1 = (np.column_stack((freq[lo_peaks], ones, 0.5 * ones)),
+                   np.column_stack((np.full(n_rows, freq[-1]), 100 * ones, 1.5 * ones)))
+        return left, bounds0, bounds1, in_range
+
+    def _fit_reflectometer_batched(self, freq: np.ndarray, data: np.ndarray,
+                                   lo_peaks: np.ndarray, hi_peaks: np.ndarray,
+                                   seeds: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        ones = np.ones(data.shape[0])
+        left, (lower, upper), bounds1, in_range = PeakFinder._reflectometer_bounds(freq, lo_peaks)
+
+        # аппроксимация левого пика
+        p0 = np.column_stack((freq[hi_peaks.min(axis=1)], 10 * ones, ones))
+        params0, ok0 = self.batched_fitter.fit(
+            freq, data,
+            p0=PeakFinder._seed_p0(p0, None if seeds is None else seeds[:, 0], lower, upper),
+            lower=lower, upper=upper, mask=left)
+        # аппроксимация правого пика
+        lower, upper = bounds1
+        p0 = np.column_stack((freq[hi_peaks.max(axis=1)], 10 * ones, ones))
+        params1, ok1 = self.batched_fitter.fit(
+            freq, data,
+            p0=PeakFinder._seed_p0(p0, None if seeds is None else seeds[:, 1], lower, upper),
+            lower=lower, upper=upper, mask=~left)
+        return np.stack((params0, params1), axis=1), ok0 & ok1 & in_range
+
+    def _estimate(self, method: str, freq: np.ndarray, data: np.ndarray,
+                  lo_peaks: np.ndarray | None = None, hi_peaks: np.ndarray | None = None
+                  ) -> tuple[np.ndarray, np.ndarray]:
+        """Оценки ClosedFormEstimator для строк data в той же форме, что у аппроксимации:
+        для "refl" левый пик ищется до минимума lo_peaks, правый - от него"""
+        from scipy.signal import medfilt
+
+        # Оценки по склонам чувствительны к шуму сильнее аппроксимации: сглаживаем в обоих режимах
+        smooth = medfilt(data, kernel_size=(1, 5))
+        if lo_peaks is None:
+            n_rows = data.shape[0]
+            params, ok = self.estimator.estimate(method, freq, smooth,
+                                                 np.tile([freq[0], 1, 0.5], (n_rows, 1)),
+                                                 np.tile([freq[-1], 100, 1.5], (n_rows, 1)))
+            return np.stack((params, np.full_like(params, np.nan)), axis=1), ok
+        left, bounds0, bounds1, in_range = PeakFinder._reflectometer_bounds(freq, lo_peaks)
+        params0, ok0 = self.estimator.estimate(method, freq, smooth, *bounds0, mask=left)
+        params1, ok1 = self.estimator.estimate(method, freq, smooth, *bounds1, mask=~left)
+        return np.stack((params0, params1), axis=1), ok0 & ok1 & in_range
+
+    @timed("peaks")
+    def create_context(self, freq: np.ndarray, data: np.ndarray) -> AnalysisContext:
+        """data - нормированные строки (точки линии, частоты)"""
+        context = AnalysisContext(freq, data)
+        if self.data_type == "refl":
+            context.lo_peaks, context.hi_peaks = self._detect_peaks(data)
+        return context
+
+    def _seeds(self, context: AnalysisContext, rows: slice | np.ndarray) -> np.ndarray | None:
+        """Параметры тех же строк предыдущего файла, если у него та же сетка"""
+        if not self.warm_start or self._previous is None:
+            return None
+        freq, params = self._previous
+        if params.shape != context.params.shape or not np.array_equal(freq, context.freq):
+            return None
+        return params[rows]
+
+    def _fit_batched(self, freq: np.ndarray, data: np.ndarray, peaks: tuple,
+                     seeds: np.ndarray | None, method: str = "batched") -> tuple[np.ndarray, np.ndarray]:
+        """Пакетная аппроксимация (или оценка method из ClosedFormEstimator.METHODS) блоками
+        по batch_rows строк: промежуточные массивы метода (якобиан и т.п.) в несколько раз
+        больше данных, блоки ограничивают память"""
+        params = np.empty((data.shape[0], 2, 3))
+        ok = np.empty(data.shape[0], dtype=bool)
+        for start in range(0, data.shape[0], self.batch_rows):
+            block = slice(start, start + self.batch_rows)
+            block_seeds = None if seeds is None else seeds[block]
+            if method in ClosedFormEstimator.METHODS:
+                params[block], ok[block] = self._estimate(method, freq, data[block], *(p[block] for p in peaks))
+            elif self.data_type == "refl":
+                params[block], ok[block] = self._fit_reflectometer_batched(
+                    freq, data[block], *(p[block] for p in peaks), seeds=block_seeds)
+            else:
+                params[block], ok[block] = self._fit_analyze_batched(freq, data[block], seeds=block_seeds)
+        return params, ok
+
+    def _closed_form_seeds(self, freq: np.ndarray, data: np.ndarray, peaks: tuple,
+                           seeds: np.ndarray | None) -> np.ndarray:
+        """Оценки fit_seed как начальные приближения. Параметры предыдущего файла
+        (warm_start), если они есть, важнее"""
+        with timer("fit.seed"):
+            estimates, ok = self._fit_batched(freq, data, peaks, None, self.fit_seed)
+        estimates[~ok] = np.nan
+        if seeds is None:
+            return estimates
+        return np.where(np.isfinite(seeds).all(axis=2, keepdims=True), seeds, estimates)
+
+    @timed("fit")
+    def _fit_rows(self, context: AnalysisContext, rows: slice | np.ndarray) -> None:
+        """Аппроксимация строк rows и сохранение параметров в контексте"""
+        freq, data = context.freq, context.data[rows]
+        peaks = () if self.data_type != "refl" else (context.lo_peaks[rows], context.hi_peaks[rows]) # type: ignore
+        seeds = self._seeds(context, rows)
+        if self.fit_seed != "default" and self.fit_engine not in ClosedFormEstimator.METHODS:
+            seeds = self._closed_form_seeds(freq, data, peaks, seeds)
+
+        if self.fit_engine in ClosedFormEstimator.METHODS:
+            params, ok = self._fit_batched(freq, data, peaks, None, self.fit_engine)
+            params[~ok] = np.nan
+        elif self.fit_engine == "batched":
+            params, ok = self._fit_batched(freq, data, peaks, seeds)
+            if seeds is not None:
+                # Разошедшиеся от начального приближения (warm_start, fit_seed) строки
+                # аппроксимируем заново с холодного старта
+                n_peaks = 2 if self.data_type == "refl" else 1
+                shift = np.abs(params[:, :n_peaks, 0] - seeds[:, :n_peaks, 0])
+                seeded = np.isfinite(seeds[:, :n_peaks]).all(axis=(1, 2))
+                diverged = seeded & (~ok | (shift > self.WARM_MAX_SHIFT * abs(freq[1] - freq[0])).any(axis=1))
+                count("warm_start_cold", np.count_nonzero(diverged))
+                if diverged.any():
+                    params[diverged], ok[diverged] = self._fit_batched(
+                        freq, data[diverged], tuple(p[diverged] for p in peaks), None)
+            params[~ok] = np.nan
+        else:
+            finder = (PeakFinder._process_row_reflectometer if self.data_type == "refl"
+                      else PeakFinder._process_row_analyze)
+            params = self._find_peak_parallel(freq, finder, data, *peaks, seeds)
+
+        context.params[rows] = params
+        context.fitted[rows] = True
 
-    def find_peak(self, freq: np.ndarray, data: np.ndarray) -> np.ndarray:
-        finder = PeakFinder._process_row_analyze
-        args = ()
+    def _peak_freq(self, context: AnalysisContext, rows: slice) -> np.ndarray:
+        params, freq = context.params[rows], context.freq
         if self.data_type == "refl":
-            finder = PeakFinder._process_row_reflectometer
-            lo_peaks, hi_peaks = PeakFinder._get_peaks(data)
-            args = (lo_peaks, hi_peaks)
-        return PeakFinder._find_peak_parallel(freq, finder, data, *args)
+            hi_peaks = context.hi_peaks[rows] # type: ignore
+            #Если что-то идёт не так, то берём среднее значение
+            fallback = (freq[hi_peaks[:, 0]] + freq[hi_peaks[:, 1]]) / 2
+            mu = params[:, :, 0].mean(axis=1)
+            count("fit_fallback", np.count_nonzero(~np.isfinite(mu)))
+            return np.where(np.isfinite(mu), mu, fallback)
+        mu = params[:, 0, 0].copy()
+        failed = ~np.isfinite(mu)
+        count("fit_fallback", np.count_nonzero(failed))
+        if not failed.any():
+            return mu
+        if self.fit_engine not in ClosedFormEstimator.METHODS and self.fit_seed == "default":
+            # Как и раньше, начало сетки частот
+            mu[failed] = freq[0]
+        else:
+            # С оценками ClosedFormEstimator - оценка по форме пика (парабола, иначе максимум строки)
+            data = context.data[rows][failed]
+            estimate, ok = self._estimate("parabolic", freq, data)
+            mu[failed] = np.where(ok, estimate[:, 0, 0], freq[np.argmax(data, axis=1)])
+        return mu
+
+    def find_peak(self, context: AnalysisContext, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Частоты пиков строк [start, stop), параметры аппроксимации остаются в контексте"""
+        rows = slice(start, context.data.shape[0] if stop is None else stop)
+        # Контекст может быть общим для нескольких вариантов параметров (SweepRunner):
+        # уже аппроксимированные строки не пересчитываются
+        todo = ~context.fitted[rows]
+        if todo.all():
+            self._fit_rows(context, rows)
+        elif todo.any():
+            self._fit_rows(context, np.flatnonzero(todo) + rows.start)
+        if self.warm_start:
+            self._previous = (np.array(context.freq), context.params.copy())
+        return self._peak_freq(context, rows)
     
-    def get_approx_laplace(self, freq: np.ndarray, data: np.ndarray) -> np.ndarray:
-        """Функция, выдающая аппроксимирующие функции Лапласса для набора данных."""
-        approx_laplace = np.zeros((3, freq.size))
-        
-        for i, data_row in enumerate(data):
+    @timed("laplace")
+    def get_approx_laplace(self, context: AnalysisContext, rows: list[int]) -> np.ndarray:
+        """Функция, выдающая аппроксимирующие функции Лапласса для строк rows.
+        Используются сохранённые параметры, неаппроксимированные строки аппроксимируются."""
+        freq = context.freq
+        missing = np.array([r for r in rows if not context.fitted[r]], dtype=int)
+        if missing.size:
+            self._fit_rows(context, missing)
+
+        approx_laplace = np.zeros((len(rows), freq.size))
+        for i, row in enumerate(rows):
+            params = context.params[row]
             if self.data_type == "refl":
-                # находим предположительные пики 
-                lo_peaks, hi_peaks = PeakFinder._get_peaks(data)
-                # аппроксимируем левый пик
-                params0, _ = curve_fit(PeakFinder._laplace_func, 
-                                    freq[:lo_peaks[i]], 
-                                    data_row[:lo_peaks[i]], 
-                                    p0=[freq[min(hi_peaks[i])], 10, 1],
-                                    maxfev=100,
-                                    bounds=([freq[0],           1, 0.5],
-                                            [freq[lo_peaks[i]], 100, 1.5]))
-                approx_laplace[i, :lo_peaks[i]] = PeakFinder._laplace_func(freq[:lo_peaks[i]], *params0)
-                # аппроксимируем правый пик
-                params1, _ = curve_fit(PeakFinder._laplace_func,
-                                    freq[lo_peaks[i]:],
-                                    data_row[lo_peaks[i]:],
-                                    p0=[freq[max(hi_peaks[i])], 10, 1],
-                                    maxfev=100,
-                                    bounds=((freq[lo_peaks[i]], 1, 0.5),
-                                            (freq[-1],         100, 1.5)))
-                approx_laplace[i, lo_peaks[i]:] = PeakFinder._laplace_func(freq[lo_peaks[i]:], *params1)
-                
-            else:
-                index_max = np.argmax(np.correlate(data_row, PeakFinder._laplace_func(np.arange(10), 5, 5, 1), mode='full')) - 5
-                y_smooth = medfilt(data_row, kernel_size=5)
-                params, _ = curve_fit(PeakFinder._laplace_func,
-                                    freq,
-                                    y_smooth,
-                                    p0=[freq[index_max], 10, 1],
-                                    maxfev=1000,
-                                    bounds=([freq[0],     1, 0.5],
-                                            [freq[-1],    100, 1.5]),
-                                            )
-                approx_laplace[i] = PeakFinder._laplace_func(freq, *params)
+                lo = context.lo_peaks[row] # type: ignore
+                if np.isfinite(params).all():
+                    approx_laplace[i, :lo] = PeakFinder._laplace_func(freq[:lo], *params[0])
+                    approx_laplace[i, lo:] = PeakFinder._laplace_func(freq[lo:], *params[1])
+            elif np.isfinite(params[0]).all():
+                approx_laplace[i] = PeakFinder._laplace_func(freq, *params[0])
 
         return approx_laplace
-    
@@ -1,17 +1,54 @@
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from time import sleep
+from typing import TYPE_CHECKING
+import threading
 import numpy as np
-import polars as pl
 
+from src.metrics.metrics import Metrics, MetricsLog, collect, timer
 from src.saver.peak_saver import PeakSaver
-from src.saver.plotter import Plotter, PlotterStats
+from src.saver.peak_archive import PeakArchive
+from src.saver.manifest import Manifest
+from src.processing.buffer_pool import BufferPool
+from src.processing.analysis_context import AnalysisContext
 from src.processing.peak_finder import PeakFinder
-from src.processing.stats_computer import StatsComputer
+from src.processing.session_stats import SessionStats
+from src.processing.stats_computer import RollingStats, StatsComputer
+from src.processing.worker_pool import PeakWorkerPool
 from src.initializer.initializer import AppParams
+from src.reader.trace_reader import RowWindow, Trace, TraceReader, TraceHeader
+from src.reader.trace_cache import TraceCache
+
+if TYPE_CHECKING:
+    from src.saver.render_queue import RenderJob
+
+@dataclass
+class FileResult:
+    """Результат обработки одного файла"""
+    path: Path
+    f0: np.ndarray
+    length: np.ndarray
+    artifacts: list[Path] = field(default_factory=list)
+    restored: bool = False
+    stats: dict[int, RollingStats] | None = None
+    metrics: Metrics = field(default_factory=Metrics)
+    # Данные получены не из файла (process_trace, приём по сокету): журнал не ведётся
+    streamed: bool = False
+    # Время записи из [INFO], None - в заголовке его нет
+    trace_time: datetime | None = None
+    # Восстановленный из журнала результат уже есть в архиве
+    archived: bool = False
+    # sha1 файла, посчитанный при чтении: журнал не перечитывает файл
+    content_hash: str | None = None
+    # Графики, отправленные в RenderQueue: в журнал они попадут после построения
+    pending: list[Path] = field(default_factory=list)
+
 
 class Processor:
-    def __init__(self, params: AppParams):
+    def __init__(self, params: AppParams, cache_mode: str = "off", output_root: Path | None = None):
+        """output_root - папка для Peaks и Figures, по умолчанию - папка обрабатываемого файла"""
         self.inv = params.inv    
+        self.output_root = output_root
         self.num_pts_norm = params.num_pts_norm
 
         self.point_cut = params.point_cut
@@ -20,123 +57,339 @@ class Processor:
         self.freq_cut = params.freq_cut
 
         self.transparency = params.transparency
+        self.lazy_roi = params.lazy_roi
 
         self.data_type = params.data_type
+        self.fit_engine = params.fit_engine
+
+        self.plots = params.plots
+        self.plotter = self.stats_plotter = self.drift_plotter = self.renderer = None
+        if self.plots:
+            self._init_plots(params)
+        self.pool = PeakWorkerPool(params.n_workers, params.chunk_size)
+        self.finder = PeakFinder(self.data_type, self.fit_engine, self.pool, params.peak_detector,
+                                 params.warm_start, params.batch_rows, params.fit_seed)
+        self.saver = PeakSaver(Path("Peaks"), params.flush_every, params.flush_interval)
+        self.saver.root = output_root
+        # Архив сессии называется так же, как таблица пиков
+        self.archive = (PeakArchive(Path(self.saver.fname).stem, params.flush_every, params.flush_interval,
+                                    on_flush=self._mark_archived)
+                        if params.archive else None)
+        self.stats_cumputer = StatsComputer(params.std_windows)
+        self.save_stats = params.save_stats
+        self.session = (SessionStats(params.baseline_files, params.ewma_alpha, params.change_threshold)
+                        if params.session_stats else None)
+        self.buffers = BufferPool()
+        self.reader = TraceReader()
+        self.cache = TraceCache(params.cache_max_mb, cache_mode)
+        self.metrics_log = MetricsLog(params.metrics)
+        self.params_hash = params.fingerprint()
+        self.manifests: dict[Path, Manifest] = {}
+        self._manifests_lock = threading.Lock()
 
-        self.dx = 1
+    def _init_plots(self, params: AppParams) -> None:
+        """Графики и очередь отрисовки. matplotlib импортируется только здесь"""
+        from src.saver.plotter import Plotter, PlotterDrift, PlotterStats
+        from src.saver.render_queue import RenderQueue
 
         self.plotter = Plotter(self.freq_cut, self.point_cut, self.point_start,
-                 self.point_end, self.dx, Path("Figures"), self.transparency)
-        self.finder = PeakFinder(self.data_type)
-        self.saver = PeakSaver(Path("Peaks"))
-        self.stats_plotter = PlotterStats(Path("Figures"), max=params.max_std)
-        self.stats_cumputer = StatsComputer(51)
-
-    def _define_rowskip(self, fname: Path) -> tuple[int, list[str]]:
-        with fname.open() as f:
-            for i, line in enumerate(f):
-                if line.split(";")[0] == "Length:":
-                    freqs = line.strip().split(";f(MHz)=")[1:]
-                    return i, freqs
-        raise ValueError("Header not found in file.")
-
-    def _get_length(self, fname: Path) -> np.ndarray:
-        with fname.open() as f:
-            for line in f:
-                if line.startswith("Point"):
-                    return np.array(line.strip().split(";")[1:], dtype=float)
-        raise ValueError("Length info not found.")
-
-    def _make_inv(self, data: np.ndarray) -> int:
+                 self.point_end, 1, Path("Figures"), self.transparency,
+                 params.plot_dpi, params.plot_format, params.plot_mode)
+        self.stats_plotter = PlotterStats(Path("Figures"), max=params.max_std,
+                                          dpi=params.plot_dpi, fmt=params.plot_format)
+        # Без фоновых процессов графики строятся сразу в analyze_file
+        self.renderer = (RenderQueue(params.render_workers, params.render_queue_size, params.render_policy,
+                                     on_done=self._log_render)
+                         if params.render_workers > 0 else None)
+        self.drift_plotter = PlotterDrift(Path("Figures"), dpi=params.plot_dpi, fmt=params.plot_format)
+
+    def close(self) -> None:
+        """Остановка пула процессов и дорисовка оставшихся графиков"""
+        self.pool.close()
+        if self.renderer is not None:
+            self.renderer.close()
+
+    def _output_dir(self, path: Path, name: str) -> Path:
+        return (self.output_root or path.parent) / name
+
+    def _log_render(self, job: "RenderJob", metrics: Metrics) -> None:
+        # Графики попадают в журнал, только когда они действительно построены
+        self._get_manifest(job.fname).add_artifacts(job.fname, job.artifacts())
+        self.metrics_log.add(job.fname, "render", metrics, self._output_dir(job.fname, "Peaks"))
+
+    def save(self) -> None:
+        """Сохранение итоговой таблицы пиков и графика дрейфа за сессию"""
+        with collect() as metrics:
+            self.saver.save_file()
+            if self.archive is not None:
+                self.archive.flush()
+            if self.plots and self.session is not None and self.session.files:
+                self.drift_plotter.output_dir = self.saver.output_dir.parent / "Figures" # type: ignore
+                self.drift_plotter.plot_drift(self.session.length, *self.session.drift(), # type: ignore
+                                              self.session.files)
+        if self.saver.long_paths:
+            self.metrics_log.add(self.saver.output_dir.parent / self.saver.fname, "save", metrics,
+                                 self.saver.output_dir)
+
+    def flush_if_due(self) -> None:
+        """Сброс буферов таблицы пиков и архива, если подошло время"""
+        self.saver.flush_if_due()
+        if self.archive is not None:
+            self.archive.flush_if_due()
+
+    def _get_manifest(self, path: Path) -> Manifest:
+        output_dir = self._output_dir(path, "Peaks")
+        with self._manifests_lock:
+            if output_dir not in self.manifests:
+                self.manifests[output_dir] = Manifest(output_dir / "manifest.jsonl", self.params_hash)
+            return self.manifests[output_dir]
+
+    def _mark_archived(self, sources: list[Path]) -> None:
+        for path in sources:
+            self._get_manifest(path).mark_archived(path)
+
+    def lookup_processed(self, path: Path) -> FileResult | None:
+        """Результат из журнала, если файл уже обработан с теми же параметрами"""
+        record = self._get_manifest(path).lookup(path)
+        if record is None:
+            return None
+        trace_time = record.get("trace_time")
+        if "trace_time" not in record:
+            # Журнал записан до появления архива: время записи берём из заголовка
+            with path.open() as f:
+                trace_time = TraceReader().read_header(f).timestamp
+        elif trace_time is not None:
+            trace_time = datetime.fromisoformat(trace_time)
+        return FileResult(path, np.array(record["f0"]), np.array(record["length"]),
+                          [path.parent / a for a in record["artifacts"]], restored=True,
+                          trace_time=trace_time, archived=record.get("archived", False))
+
+    def _make_inv(self, data: np.ndarray, dx: float, offset: int = 0) -> int:
         coef = 1
         if self.inv == "auto":
-            ref = data[int(self.point_cut / self.dx)]
+            ref = data[int(self.point_cut / dx) - offset]
             coef = -1 if (ref.mean() - ref.min()) > (ref.max() - ref.mean()) else 1
         elif self.inv:
             coef = -1
         return coef
     
-    def _check_end_creating(self, path: Path) -> None:
-        # Ждём, пока закончится запись файла
-        file_size_prev = 0
-        
-        while (path.stat().st_size != file_size_prev):
-            file_size_prev = path.stat().st_size
-            sleep(0.5)
+    def _roi_window(self, header: TraceHeader) -> RowWindow | None:
+        """Строки файла, нужные для обработки: балласт и точки от point_start до point_end
+        (с point_cut между ними). Считается по заголовку, до разбора тела файла"""
+        if header.distances.size < 2:
+            return None
+        # Расстояния в float32, как столбец длины в теле файла
+        distances = header.distances[:2].astype(np.float32)
+        dx = abs(distances[1] - distances[0])
+        point_end = min(header.points * dx - dx, self.point_end)
+        phase = header.num_phase
+        # Начало окна кратно количеству сдвигов фазы, чтобы не сбить нормировку по балласту.
+        # Конец с запасом в пару строк: конец линии по окну не должен оказаться раньше point_end
+        return RowWindow(head=self.num_pts_norm * phase,
+                         start=self._get_index(self.point_start, dx) // phase * phase,
+                         stop=min(header.points, self._get_index(point_end, dx) + 3))
 
-    def _read_file(self, path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-        self._check_end_creating(path)
-        skip_rows, freqs = self._define_rowskip(path)
-        
-        data = pl.read_csv(
-            path,
-            separator=";",
-            skip_rows=skip_rows,
-            columns=range(0, len(freqs) + 1), 
-            truncate_ragged_lines=True
-            ).with_columns([pl.col("*").cast(pl.Float32)]).to_numpy()
-        length = data[:, 0]
-        self.dx = abs(length[1] - length[0])
-
-        return data[:, 1:], np.array(freqs, dtype=np.float32), length
-
-    def _define_num_phase(self, fname: Path) -> int:
-        with fname.open() as f:
-            f.readline()
-            return int(f.readline().split(";")[3].split("=")[1])
-
-    def _norm_data_by_ballast(self, data: np.ndarray, num_phase_shift: int) -> np.ndarray:
+    def _read_file(self, path: Path, full: bool = False) -> Trace:
+        """Разобранный файл: из кэша или чтением. При lazy_roi (и не full) - только окно строк,
+        без кэша из файла читаются только строки окна"""
+        window = self._roi_window if self.lazy_roi and not full else None
+        with timer("read.cache"):
+            trace = self.cache.load(path)
+        if trace is not None:
+            return trace.window(None if window is None else window(trace.header))
+        if self.cache.mode == "off":
+            with timer("read.parse"):
+                return self.reader.read(path, window)
+        # С кэшем файл читается целиком: в кэш попадает вся матрица, окно берётся из неё,
+        # и следующие запуски с lazy_roi (в том числе с другим участком) читают кэш
+        with timer("read.parse"):
+            trace = self.reader.read(path)
+        with timer("read.cache_store"):
+            self.cache.store(path, trace)
+        return trace.window(None if window is None else window(trace.header))
+
+    def _norm_data_by_ballast(self, data: np.ndarray, num_phase_shift: int,
+                              out: np.ndarray | None = None, ballast: np.ndarray | None = None) -> np.ndarray:
+        """Вычитание среднего по первым num_pts_norm точкам для каждого сдвига фазы.
+        Точки балласта берутся из ballast, если data - окно строк без начала файла"""
         reshaped = data.reshape((-1, num_phase_shift, data.shape[1]))
-        baseline = reshaped[:self.num_pts_norm].mean(axis=0)
-        return (reshaped - baseline).reshape((-1, data.shape[1]))
+        baseline = (reshaped if ballast is None else
+                    ballast.reshape((-1, num_phase_shift, data.shape[1])))[:self.num_pts_norm].mean(axis=0)
+        if out is None:
+            return (reshaped - baseline).reshape((-1, data.shape[1]))
+        # Строки одного сдвига фазы идут через num_phase_shift, срезы - представления без копий
+        for k in range(num_phase_shift):
+            np.subtract(data[k::num_phase_shift], baseline[k], out=out[k::num_phase_shift])
+        return out
     
-    def _norm_data_by_max(self, data: np.ndarray) -> np.ndarray:
+    def _norm_data_by_max(self, data: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Нормировка каждой строки на [0, 1]. Минимум вычитается из data на месте,
+        результат (частоты, точки) записывается в out.T, если out задан"""
         data = data.T
         data -= data.min(axis=0)
-        return data / data.max(axis=0)
+        if out is None:
+            return data / data.max(axis=0)
+        return np.divide(data, data.max(axis=0), out=out.T)
 
-    def _get_index(self, length: float) -> int:
-        return int(length / self.dx)
+    def _get_index(self, length: float, dx: float) -> int:
+        return int(length / dx)
 
-    def _data_prepare(self, path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-        data, freqs, length = self._read_file(path)
-        data_norm = self._norm_data_by_ballast(data, self._define_num_phase(path))
-        return data_norm * self._make_inv(data_norm), freqs, length
+    def _data_prepare(self, path: Path, trace: Trace | None = None
+                      ) -> tuple[np.ndarray, np.ndarray, np.ndarray, float, int, TraceHeader]:
+        """Нормированные по балласту строки, частоты, длина, шаг, номер первой строки
+        (не 0 при lazy_roi) и заголовок. trace - уже разобранный целиком файл, если есть"""
+        if trace is None:
+            trace = self._read_file(path)
+        elif self.lazy_roi:
+            trace = trace.window(self._roi_window(trace.header))
+        data, length = trace.data, trace.length
+        dx = abs(length[1] - length[0])
+        with timer("normalize"):
+            # Данные файла не меняем (это может быть memmap кэша), результат - в буфер пула
+            data_norm = self._norm_data_by_ballast(
+                data, trace.header.num_phase, out=self.buffers.get("ballast", data.shape, data.dtype, "F"),
+                ballast=None if trace.ballast is None else trace.ballast_data)
+            if self._make_inv(data_norm, dx, trace.offset) == -1:
+                np.negative(data_norm, out=data_norm)
+            return data_norm, trace.header.freqs, length, dx, trace.offset, trace.header
 
+    def analyze_file(self, path: Path, trace: Trace | None = None, shared: dict | None = None) -> FileResult:
+        """Обработка файла: поиск пиков и графики. Общее состояние Processor не меняется,
+        поэтому метод можно вызывать для нескольких файлов одновременно.
+        trace и shared используются при переборе параметров (SweepRunner): файл разобран
+        один раз, а в shared лежат нормированные данные и аппроксимации, общие для вариантов"""
+        with collect() as metrics:
+            with timer("total"):
+                result = self._analyze_file(path, trace, shared)
+        result.metrics = metrics
+        return result
 
-    def process_file(self, path: Path) -> None:
-        sleep(0.5)
+    def _prepare_key(self) -> tuple:
+        """Параметры, от которых зависят нормированные данные"""
+        roi = (self.point_start, self.point_end) if self.lazy_roi else None
+        return (self.num_pts_norm, self.inv, self.point_cut, roi)
+
+    def _fit_key(self) -> tuple | None:
+        """Параметры, от которых зависят аппроксимации строк. None - контекст не разделяется:
+        при warm_start результат зависит от предыдущих файлов этого Processor"""
+        if self.finder.warm_start:
+            return None
+        return self._prepare_key() + (self.data_type, self.fit_engine, self.finder.peak_detector,
+                                     self.finder.fit_seed)
+
+    def _prepare(self, path: Path, trace: Trace | None, shared: dict | None) -> tuple:
+        key = ("prepare",) + self._prepare_key()
+        if shared is not None and key in shared:
+            return shared[key]
+        data_norm, freqs, length, dx, offset, header = self._data_prepare(path, trace)
+        with timer("normalize"):
+            data_max = self._norm_data_by_max(
+                data_norm, out=self.buffers.get("norm", data_norm.shape, data_norm.dtype, "F")).T
+        prepared = (data_norm, data_max, freqs, length, dx, offset, header)
+        if shared is not None:
+            shared[key] = prepared
+        return prepared
+
+    def _context(self, freqs: np.ndarray, data_max: np.ndarray, shared: dict | None) -> AnalysisContext:
+        key = self._fit_key()
+        if shared is None or key is None:
+            return self.finder.create_context(freqs, data_max)
+        key = ("context",) + key
+        if key not in shared:
+            shared[key] = self.finder.create_context(freqs, data_max)
+        return shared[key]
+
+    def _roi_rows(self, n_rows: int, dx: float, offset: int) -> tuple[float, int, int]:
+        """Конец линии и строки [start, end) участка обработки.
+        Номера строк - в данных, которые при lazy_roi начинаются со строки offset файла"""
+        point_end = min((offset + n_rows) * dx - dx, self.point_end)
+        return point_end, self._get_index(self.point_start, dx) - offset, self._get_index(point_end, dx) - offset
+
+    def _peaks(self, context: AnalysisContext, length: np.ndarray, start: int, end: int
+               ) -> tuple[np.ndarray, np.ndarray, dict[int, RollingStats]]:
+        f0 = self.finder.find_peak(context, start, end)
+        with timer("stats"):
+            stats = self.stats_cumputer.compute(f0)
+        return f0, np.array(length[start: end]), stats
+
+    def analyze_trace(self, trace: Trace, name: str = "trace") -> FileResult:
+        """Поиск пиков и скользящие статистики уже прочитанных данных, без графиков и записи файлов"""
+        with collect() as metrics:
+            with timer("total"):
+                data_norm, data_max, freqs, length, dx, offset, header = self._prepare(Path(name), trace, None)
+                _, start, end = self._roi_rows(data_norm.shape[0], dx, offset)
+                f0, length_roi, stats = self._peaks(self.finder.create_context(freqs, data_max), length, start, end)
+        return FileResult(Path(name), f0, length_roi, stats=stats, metrics=metrics, streamed=True,
+                          trace_time=header.timestamp)
+
+    def _analyze_file(self, path: Path, trace: Trace | None = None, shared: dict | None = None) -> FileResult:
         print(f"Начали обрабатывать {path}")
         
-        data_norm, freqs, length = self._data_prepare(path)
-        point_end = min(data_norm.shape[0] * self.dx - self.dx, self.point_end)
+        data_norm, data_max, freqs, length, dx, offset, header = self._prepare(path, trace, shared)
+        point_end, start, end = self._roi_rows(data_norm.shape[0], dx, offset)
+        context = self._context(freqs, data_max, shared)
+        f0, length_roi, stats = self._peaks(context, length, start, end)
+        artifacts = [self.saver.stats_path(path)] if self.save_stats else []
+        pending: list[Path] = []
+
+        if self.plots:
+            from src.saver.render_queue import RenderJob, render
+            approx_laplace = self.finder.get_approx_laplace(
+                context, [start, self._get_index(self.point_cut, dx) - offset, end])
+            figures = self._output_dir(path, "Figures")
+            job = RenderJob(self.plotter.for_file(figures, dx, point_end, offset), # type: ignore
+                            self.stats_plotter.for_file(figures), # type: ignore
+                            # Буферы пула переиспользуются следующим файлом, в фоновую отрисовку - копия
+                            path, data_norm if self.renderer is None else data_norm.copy(),
+                            np.asarray(freqs), np.array(length), f0, approx_laplace,
+                            stats, length_roi)
+            if self.renderer is not None:
+                # В журнал графики внесёт _log_render после построения
+                with timer("plot.submit"):
+                    self.renderer.submit(job)
+                pending = job.artifacts()
+            else:
+                render(job)
+                artifacts += job.artifacts()
         
-        self.plotter.output_dir = path.parent / "Figures"
-        self.plotter.dx = abs(length[1] - length[0])
-        self.plotter.point_end = point_end
+        print(f"Закончили обрабатывать {path}")
+        return FileResult(path, f0, length_roi, artifacts, stats=stats, trace_time=header.timestamp,
+                          content_hash=header.content_hash, pending=pending)
 
-        self.saver.output_dir = path.parent / "Peaks"
-        self.stats_plotter.output_dir = path.parent / "Figures"
+    def commit(self, result: FileResult) -> None:
+        """Передача результата в PeakSaver и журнал обработанных файлов"""
+        with collect(result.metrics), timer("save"):
+            self.saver.output_dir = self._output_dir(result.path, "Peaks")
+            self.saver.add_peak(result.f0, result.path.stem, result.length)
+            if result.restored:
+                print(f"Уже обработан {result.path}")
+            else:
+                if self.save_stats and result.stats is not None:
+                    self.saver.save_stats(result.path, result.length, result.stats)
+                if not result.streamed:
+                    self._get_manifest(result.path).add(result.path, result.artifacts, result.f0, result.length,
+                                                        result.trace_time, result.content_hash, result.pending)
+            # Уже обработанные файлы попадают в архив, если их там ещё нет (архив включили
+            # позже или процесс завершился до записи части архива)
+            if self.archive is not None and not result.archived:
+                self.archive.add(self.output_root or result.path.parent, result.path.stem,
+                                 result.trace_time, result.length, result.f0,
+                                 None if result.streamed else result.path)
+            if self.session is not None:
+                self._update_session(result)
+        self.metrics_log.add(result.path, "restored" if result.restored else "file", result.metrics,
+                             self._output_dir(result.path, "Peaks"))
 
-        f0 = self.finder.find_peak(freqs,
-                                self._norm_data_by_max(data_norm).T[self._get_index(self.point_start):
-                                                                    self._get_index(point_end)])
-        
-        approx_laplace = self.finder.get_approx_laplace(
-            freqs, 
-            self._norm_data_by_max(data_norm).T[[self._get_index(self.point_start), self._get_index(self.point_cut), self._get_index(point_end)]]
-            )
-
-        self.plotter.create_plot(data_norm,
-                            freqs,
-                            length,
-                            f0,
-                            path,
-                            approx_laplace)
-        
-        self.stats_plotter.plot_std(
-            self.stats_cumputer.compute_std(f0),
-            length[self._get_index(self.point_start): self._get_index(point_end)], path)
-        
-        self.saver.add_peak(f0, path.stem, length[self._get_index(self.point_start): self._get_index(point_end)])
-        print(f"Закончили обрабатывать {path}")
\ No newline at end of file
+    def _update_session(self, result: FileResult) -> None:
+        with timer("session"):
+            summary = self.session.update(result.path.stem, result.f0, result.length) # type: ignore
+        if summary is not None:
+            print(SessionStats.describe(summary))
+            SessionStats.save_summary(self.saver.output_dir, summary)
+
+    def restore_or_analyze(self, path: Path) -> FileResult:
+        result = self.lookup_processed(path)
+        return result if result is not None else self.analyze_file(path)
+
+    def process_file(self, path: Path) -> None:
+        self.commit(self.restore_or_analyze(path))
@@ -0,0 +1,124 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+import json
+
+import numpy as np
+
+
+@dataclass
+class SessionSummary:
+    """Сводка по файлу относительно предыдущих файлов сессии"""
+    file: str
+    index: int
+    baseline_ready: bool
+    delta_mean: float | None = None
+    delta_max: float | None = None
+    delta_max_distance: float | None = None
+    ewma_delta_max: float | None = None
+    changed: int = 0
+
+
+class SessionStats:
+    """Накопление статистик f0 по точкам линии за сессию (между файлами).
+
+    Для каждой точки хранятся количество, среднее и сумма квадратов отклонений
+    (алгоритм Уэлфорда), экспоненциальное среднее с коэффициентом alpha и опорная
+    линия - среднее первых baseline_files файлов. Все массивы размером с количество
+    точек, поэтому память и время обновления не зависят от длины сессии.
+    Файлы с другой сеткой расстояний, чем у первого файла, не учитываются.
+    """
+
+    def __init__(self, baseline_files: int = 10, alpha: float = 0.1, threshold: float = 3) -> None:
+        self.baseline_files = baseline_files
+        self.alpha = alpha
+        self.threshold = threshold
+        self.files = 0
+        self.length: np.ndarray | None = None
+
+    def _reset(self, length: np.ndarray) -> None:
+        self.length = np.array(length, dtype=float)
+        shape = self.length.shape
+        self.count = np.zeros(shape, dtype=int)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.ewma = np.full(shape, np.nan)
+        self.last = np.full(shape, np.nan)
+        self.baseline_sum = np.zeros(shape)
+        self.baseline_count = np.zeros(shape, dtype=int)
+        self.baseline: np.ndarray | None = None
+
+    @property
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+    def _changed(self, f0: np.ndarray) -> int:
+        """Количество точек, где f0 отличается от среднего сессии больше чем на threshold СКО"""
+        enough = self.count >= 2
+        with np.errstate(invalid="ignore"):
+            return int(np.count_nonzero(enough & (np.abs(f0 - self.mean) > self.threshold * self.std)))
+
+    def update(self, fname: str, f0: np.ndarray, length: np.ndarray) -> SessionSummary | None:
+        if self.length is None:
+            self._reset(length)
+        if not np.array_equal(self.length, length):
+            print(f"Сессия: сетка расстояний {fname} не совпадает с первым файлом, файл не учтён")
+            return None
+
+        f0 = np.asarray(f0, dtype=float)
+        valid = np.isfinite(f0)
+        changed = self._changed(f0)
+
+        # Алгоритм Уэлфорда
+        self.count += valid
+        delta = np.where(valid, f0 - self.mean, 0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += np.where(valid, delta * (f0 - self.mean), 0)
+
+        self.last = f0
+        self.ewma = np.where(valid & np.isnan(self.ewma), f0, self.ewma)
+        self.ewma = np.where(valid, self.ewma + self.alpha * (f0 - self.ewma), self.ewma)
+
+        if self.baseline is None:
+            self.baseline_sum += np.where(valid, f0, 0)
+            self.baseline_count += valid
+            if self.files + 1 >= self.baseline_files:
+                with np.errstate(invalid="ignore"):
+                    self.baseline = self.baseline_sum / self.baseline_count
+        self.files += 1
+
+        summary = SessionSummary(fname, self.files, self.baseline is not None, changed=changed)
+        if self.baseline is not None:
+            drift = np.abs(f0 - self.baseline)
+            if np.isfinite(drift).any():
+                i = int(np.nanargmax(drift))
+                summary.delta_mean = float(np.nanmean(f0 - self.baseline))
+                summary.delta_max = float(f0[i] - self.baseline[i])
+                summary.delta_max_distance = float(self.length[i])
+                summary.ewma_delta_max = float(np.nanmax(np.abs(self.ewma - self.baseline)))
+        return summary
+
+    def drift(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Последний файл, среднее и экспоненциальное среднее относительно опорной линии, СКО.
+        Пока опорная линия не набрана, отсчёт ведётся от среднего уже учтённых файлов"""
+        with np.errstate(invalid="ignore"):
+            baseline = (self.baseline if self.baseline is not None
+                        else self.baseline_sum / self.baseline_count)
+        return self.last - baseline, self.mean - baseline, self.ewma - baseline, self.std
+
+    @staticmethod
+    def save_summary(output_dir: Path, summary: SessionSummary) -> None:
+        """Дописывание сводки в output_dir/session.jsonl"""
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"), **asdict(summary)}
+        output_dir.mkdir(exist_ok=True)
+        with (output_dir / "session.jsonl").open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def describe(summary: SessionSummary) -> str:
+        if not summary.baseline_ready or summary.delta_max is None:
+            return f"Сессия: файл {summary.index}, опорная линия ещё набирается"
+        return (f"Сессия: файл {summary.index}, Δf0 среднее {summary.delta_mean:.2f} МГц, "
+                f"макс. {summary.delta_max:.2f} МГц на {summary.delta_max_distance:g} м, "
+                f"изменились {summary.changed} точек")
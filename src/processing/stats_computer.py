@@ -1,19 +1,78 @@
+from dataclasses import dataclass
+from typing import ClassVar, Iterable
+
 import numpy as np
 
-from pathlib import Path
+
+@dataclass
+class RollingStats:
+    """Скользящие статистики частот пиков для одного размера окна"""
+    window: int
+    mean: np.ndarray
+    std: np.ndarray
+    median: np.ndarray
+    mad: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+    NAMES: ClassVar[tuple[str, ...]] = ("mean", "std", "median", "mad", "min", "max")
+
+    def columns(self) -> dict[str, np.ndarray]:
+        return {f"{name}_{self.window}": getattr(self, name) for name in RollingStats.NAMES}
+
 
 class StatsComputer:
-    def __init__(self, count_points: int) -> None:
-        self.count_points = count_points
+    """Скользящие статистики для одного или нескольких окон.
+
+    Края дополняются отражением (np.pad mode='reflect'), окно центрировано, чётные
+    размеры окна увеличиваются на 1. Среднее и СКО считаются по накопленным суммам
+    за O(n) на окно; перед суммированием вычитается среднее по линии, поэтому
+    E[x^2] - E[x]^2 не теряет точность на частотах порядка 10^4 МГц.
+    """
+
+    def __init__(self, windows: int | Iterable[int]) -> None:
+        windows = [windows] if isinstance(windows, int) else list(windows)
+        self.windows = tuple(w if w % 2 else w + 1 for w in windows)
+
+    @property
+    def count_points(self) -> int:
+        return self.windows[0]
+
+    def compute(self, peaks: np.ndarray) -> dict[int, RollingStats]:
+        from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+        peaks = np.asarray(peaks, dtype=float)
+        max_pad = max(self.windows) // 2
+        shift = peaks.mean()
+        x_pad = np.pad(peaks - shift, pad_width=max_pad, mode='reflect')
+
+        # Накопленные суммы считаются один раз для всех окон
+        csum = np.concatenate(([0], np.cumsum(x_pad)))
+        csum2 = np.concatenate(([0], np.cumsum(x_pad ** 2)))
+
+        stats = {}
+        for window in self.windows:
+            pad = window // 2
+            begin = np.arange(peaks.size) + max_pad - pad
+            mean = (csum[begin + window] - csum[begin]) / window
+            var = (csum2[begin + window] - csum2[begin]) / window - mean ** 2
+
+            windows = np.lib.stride_tricks.sliding_window_view(
+                x_pad[max_pad - pad: max_pad - pad + peaks.size + window - 1], window)
+            median = np.median(windows, axis=1)
+            mad = np.median(np.abs(windows - median[:, None]), axis=1)
+
+            x_win = x_pad[max_pad - pad: max_pad + pad + peaks.size]
+            stats[window] = RollingStats(
+                window=window,
+                mean=mean + shift,
+                std=np.sqrt(np.maximum(var, 0)),
+                median=median + shift,
+                mad=mad,
+                min=minimum_filter1d(x_win, window)[pad: pad + peaks.size] + shift,
+                max=maximum_filter1d(x_win, window)[pad: pad + peaks.size] + shift,
+            )
+        return stats
 
     def compute_std(self, peaks: np.ndarray) -> np.ndarray:
-        if (self.count_points % 2) == 0: 
-            self.count_points += 1
-        pad = self.count_points // 2
-        x_pad = np.pad(peaks, pad_width=pad, mode='reflect')
-
-        std = np.zeros_like(peaks)
-        for i in range(peaks.size):
-            std[i] = np.std(x_pad[i: i + self.count_points])
-        
-        return std
+        return self.compute(peaks)[self.count_points].std
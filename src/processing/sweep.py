@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.initializer.initializer import AppParams
+from src.processing.processor import FileResult, Processor
+
+
+class SweepRunner:
+    """Обработка файлов с несколькими вариантами параметров за один проход чтения.
+
+    Каждый файл разбирается один раз, после чего обрабатывается каждым вариантом.
+    Варианты с одинаковыми параметрами нормировки используют общие нормированные
+    данные, а с одинаковыми ещё и параметрами аппроксимации - общие аппроксимации строк
+    (строки, уже аппроксимированные другим вариантом, не пересчитываются).
+    Результаты варианта сохраняются в root/<имя варианта>/Peaks и Figures, сравнительная
+    таблица по файлам и вариантам - в root/comparison.csv. Графики строятся сразу,
+    без фоновой очереди (render_workers=0): иначе каждый вариант запускал бы свой пул
+    процессов отрисовки.
+    """
+    COLUMNS = ("variant", "file", "points", "f0_mean", "f0_std", "f0_min", "f0_max",
+               "f0_diff", "fit_fallback", "time")
+
+    def __init__(self, variants: dict[str, AppParams], root: Path, cache_mode: str = "off") -> None:
+        self.root = root
+        self.processors: dict[str, Processor] = {}
+        for name, params in variants.items():
+            (root / name).mkdir(parents=True, exist_ok=True)
+            params = params.model_copy(update={"render_workers": 0})
+            self.processors[name] = Processor(params, cache_mode, output_root=root / name)
+        self.rows: list[tuple] = []
+
+    def _compare(self, name: str, result: FileResult, reference: FileResult) -> None:
+        f0 = result.f0
+        # Среднее отклонение от первого варианта на общих точках линии
+        _, i, j = np.intersect1d(result.length, reference.length, return_indices=True)
+        diff = float(np.mean(np.abs(f0[i] - reference.f0[j]))) if i.size else np.nan
+        self.rows.append((name, result.path.stem, f0.size, np.mean(f0), np.std(f0), np.min(f0), np.max(f0),
+                          diff, result.metrics.counters.get("fit_fallback", 0),
+                          result.metrics.timings.get("total", 0)))
+
+    def process_file(self, path: Path) -> None:
+        restored = {name: p.lookup_processed(path) for name, p in self.processors.items()}
+        trace = None
+        if any(r is None for r in restored.values()):
+            reader = next(iter(self.processors.values()))
+            trace = reader._read_file(path, full=True)
+        shared: dict = {}
+        reference = None
+        for name, processor in self.processors.items():
+            result = restored[name] or processor.analyze_file(path, trace, shared)
+            processor.commit(result)
+            reference = reference or result
+            self._compare(name, result, reference)
+
+    def process_files(self, fnames: list[Path]) -> None:
+        for fname in fnames:
+            try:
+                self.process_file(fname)
+            except Exception as e:
+                print(f"Ошибка обработки {fname}: {str(e)}")
+
+    def report(self) -> str:
+        """Средние по файлам значения для каждого варианта"""
+        lines = [f"{'Вариант':<32}{'Файлов':>8}{'f0 ср.':>12}{'СКО f0':>10}{'Откл.':>10}{'Сбоев':>8}{'Время, с':>10}"]
+        for name in self.processors:
+            rows = [r for r in self.rows if r[0] == name]
+            if not rows:
+                continue
+            diff = [r[7] for r in rows if np.isfinite(r[7])]
+            lines.append(f"{name:<32}{len(rows):>8}{np.mean([r[3] for r in rows]):>12.2f}"
+                         f"{np.mean([r[4] for r in rows]):>10.2f}{np.mean(diff) if diff else np.nan:>10.2f}"
+                         f"{sum(r[8] for r in rows):>8}{sum(r[9] for r in rows):>10.2f}")
+        return "\n".join(lines)
+
+    def save(self) -> None:
+        for processor in self.processors.values():
+            processor.save()
+        if not self.rows:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with (self.root / "comparison.csv").open("w", encoding="utf-8") as f:
+            f.write(";".join(self.COLUMNS) + "\n")
+            for row in self.rows:
+                f.write(";".join(f"{v:.6f}" if isinstance(v, float) else str(v) for v in row) + "\n")
+        print(self.report())
+
+    def close(self) -> None:
+        for processor in self.processors.values():
+            processor.close()
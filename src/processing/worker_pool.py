@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Callable
+import shutil
+import tempfile
+
+import numpy as np
+
+
+def _process_chunk(process_row: Callable, freq: np.ndarray, data: np.ndarray, *args) -> list[float]:
+    """data и построчные массивы args - уже срезы куска, индексы строк локальные"""
+    return [process_row(freq, data[i], i, *args) for i in range(data.shape[0])]
+
+
+def _chunk_args(args: tuple, n_rows: int, start: int, stop: int) -> tuple:
+    """Срезы [start, stop) построчных массивов (первая размерность - n_rows), остальное без изменений"""
+    return tuple(a[start:stop] if isinstance(a, np.ndarray) and a.ndim and a.shape[0] == n_rows else a
+                 for a in args)
+
+
+class PeakWorkerPool:
+    """Долгоживущий пул процессов для построчной аппроксимации.
+
+    Пул создаётся при первом обращении и переиспользуется для всех следующих файлов,
+    поэтому в режиме мониторинга процессы запускаются один раз. Строки раздаются
+    кусками по chunk_size. Матрица файла и построчные массивы (lo_peaks, hi_peaks, seeds)
+    один раз записываются в memmap (в /dev/shm, если есть), в задачу попадают срезы
+    этих memmap, и joblib передаёт их процессам ссылкой на файл, без копирования данных.
+    """
+
+    def __init__(self, n_workers: int = -1, chunk_size: int = 64, max_nbytes: str = "1M") -> None:
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.max_nbytes = max_nbytes
+        self._parallel = None
+        self._shared_dir: Path | None = None
+        self._shared_count = 0
+
+    def _share(self, array: np.ndarray, name: str) -> np.ndarray:
+        """Копия array в memmap: его срезы joblib передаёт процессам ссылкой на файл"""
+        if self._shared_dir is None:
+            shm = Path("/dev/shm")
+            self._shared_dir = Path(tempfile.mkdtemp(prefix="uidt_rows_", dir=shm if shm.is_dir() else None))
+        self._shared_count += 1
+        path = self._shared_dir / f"{name}_{self._shared_count}.npy"
+        np.save(path, np.ascontiguousarray(array))
+        return np.load(path, mmap_mode="r")
+
+    def _get_parallel(self):
+        if self._parallel is None:
+            # joblib загружается при первой построчной аппроксимации (fit_engine "batched" и оценки без неё)
+            from joblib import Parallel
+            self._parallel = Parallel(n_jobs=self.n_workers, max_nbytes=self.max_nbytes, mmap_mode="r")
+            self._parallel.__enter__()
+        return self._parallel
+
+    def map_rows(self, process_row: Callable, freq: np.ndarray, data: np.ndarray, *args) -> np.ndarray:
+        """Применяет process_row(freq, data[i], i, *args) ко всем строкам data.
+        Строки обрабатываются независимо: результат не зависит от chunk_size и n_workers."""
+        chunks = range(0, data.shape[0], self.chunk_size)
+        from joblib import delayed
+        n_rows = data.shape[0]
+        if self.n_workers != 1:
+            data = self._share(data, "data")
+            args = tuple(self._share(a, f"arg{k}") if isinstance(a, np.ndarray) and a.ndim and a.shape[0] == n_rows
+                         else a for k, a in enumerate(args))
+        results = self._get_parallel()(
+            delayed(_process_chunk)(process_row, freq, data[start: start + self.chunk_size],
+                                   *_chunk_args(args, n_rows, start, start + self.chunk_size))
+            for start in chunks)
+        if self._shared_dir is not None:
+            # Открытые memmap остаются действительными и после удаления файлов
+            for path in self._shared_dir.iterdir():
+                path.unlink()
+        return np.array([value for chunk in results for value in chunk]) # type: ignore
+
+    def close(self) -> None:
+        if self._parallel is not None:
+            self._parallel.__exit__(None, None, None)
+            self._parallel = None
+        if self._shared_dir is not None:
+            shutil.rmtree(self._shared_dir, ignore_errors=True)
+            self._shared_dir = None
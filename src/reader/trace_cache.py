@@ -0,0 +1,100 @@
+from dataclasses import asdict
+from hashlib import sha1
+from pathlib import Path
+import json
+import os
+import shutil
+
+import numpy as np
+
+from src.reader.trace_reader import Trace, TraceHeader
+
+
+class TraceCache:
+    """Кэш разобранных файлов УИДТ в папке .cache рядом с Figures и Peaks.
+
+    Ключ записи строится по абсолютному пути, размеру и времени изменения файла.
+    Числовая часть хранится в .npy и открывается через memmap без копирования,
+    заголовок - в header.json. При превышении max_size_mb удаляются записи,
+    к которым дольше всего не обращались.
+    """
+    ARRAYS = ("body", "freqs", "distances")
+
+    def __init__(self, max_size_mb: float = 2048, mode: str = "off") -> None:
+        self.max_size = int(max_size_mb * 1024 ** 2)
+        self.mode = mode
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        stat = path.stat()
+        return sha1(f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()
+
+    @staticmethod
+    def _cache_dir(path: Path) -> Path:
+        return path.parent / ".cache"
+
+    def _entry(self, path: Path) -> Path:
+        return TraceCache._cache_dir(path) / TraceCache._key(path)
+
+    def load(self, path: Path) -> Trace | None:
+        if self.mode != "on":
+            return None
+        entry = self._entry(path)
+        meta = entry / "header.json"
+        if not meta.is_file():
+            return None
+        try:
+            fields = json.loads(meta.read_text(encoding="utf-8"))
+            arrays = {name: np.load(entry / f"{name}.npy", mmap_mode="r") for name in TraceCache.ARRAYS}
+        except (OSError, ValueError):
+            return None
+        # Время обращения для вытеснения давно не использованных записей
+        os.utime(meta)
+        header = TraceHeader(freqs=arrays["freqs"], distances=arrays["distances"], **fields)
+        return Trace(header, arrays["body"])
+
+    def store(self, path: Path, trace: Trace) -> None:
+        if self.mode == "off":
+            return
+        entry = self._entry(path)
+        tmp = entry.with_name(entry.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "body.npy", trace.body)
+        np.save(tmp / "freqs.npy", trace.header.freqs)
+        np.save(tmp / "distances.npy", trace.header.distances)
+        fields = {k: v for k, v in asdict(trace.header).items() if k not in ("freqs", "distances")}
+        (tmp / "header.json").write_text(json.dumps(fields, ensure_ascii=False), encoding="utf-8")
+
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp.rename(entry)
+        self._evict(TraceCache._cache_dir(path))
+
+    @staticmethod
+    def _entry_size(entry: Path) -> int | None:
+        try:
+            return sum(f.stat().st_size for f in entry.iterdir())
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _entry_time(entry: Path) -> float | None:
+        try:
+            return (entry / "header.json").stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _evict(self, cache_dir: Path) -> None:
+        # Записи могут удалять параллельно другие процессы (--jobs, мониторинг),
+        # исчезнувшие между просмотром папки и stat записи пропускаются
+        times = {e: TraceCache._entry_time(e) for e in cache_dir.iterdir()}
+        sizes = {e: TraceCache._entry_size(e) for e, t in times.items() if t is not None}
+        entries = sorted((e for e, size in sizes.items() if size is not None), key=times.get)
+        sizes = {e: sizes[e] for e in entries}
+        total = sum(sizes.values())
+        for entry in entries[:-1]:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
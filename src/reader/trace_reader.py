@@ -0,0 +1,238 @@
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from hashlib import sha1
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Callable, TextIO
+import io
+import warnings
+
+import numpy as np
+
+
+@dataclass
+class TraceHeader:
+    """Заголовок файла УИДТ ([INFO], [REFLECT], [LASER], [FREQ], Point distances, Length:)"""
+    date: str
+    time: str
+    points: int
+    summ_count: int
+    datarate: int
+    freq_start: float
+    freq_end: float
+    freq_step: float
+    distances: np.ndarray
+    freqs: np.ndarray
+    header_rows: int
+    sections: dict[str, dict[str, str]] = field(default_factory=dict)
+    # sha1 содержимого файла, считается при чтении (журнал не перечитывает файл)
+    content_hash: str | None = None
+
+    @property
+    def num_phase(self) -> int:
+        """Количество фазовых сдвигов на одну точку линии"""
+        return self.datarate
+
+    @property
+    def timestamp(self) -> datetime | None:
+        """Время записи из [INFO] (date=дд/мм/гг, time=чч:мм:сс), None - если его нет"""
+        try:
+            return datetime.strptime(f"{self.date} {self.time}", "%d/%m/%y %H:%M:%S")
+        except ValueError:
+            return None
+
+
+@dataclass
+class RowWindow:
+    """Строки файла, которые нужно прочитать: первые head строк (балласт) и строки [start, stop)"""
+    head: int
+    start: int
+    stop: int
+
+
+@dataclass
+class Trace:
+    """Разобранный файл. Если прочитано окно строк, body - строки начиная с offset,
+    а ballast - первые строки файла, по которым выполняется нормировка"""
+    header: TraceHeader
+    body: np.ndarray
+    offset: int = 0
+    ballast: np.ndarray | None = None
+
+    @property
+    def data(self) -> np.ndarray:
+        return self.body[:, 1:]
+
+    @property
+    def length(self) -> np.ndarray:
+        return self.body[:, 0]
+
+    @property
+    def ballast_data(self) -> np.ndarray:
+        return self.data if self.ballast is None else self.ballast[:, 1:]
+
+    def window(self, rows: RowWindow | None) -> "Trace":
+        """Окно строк полностью прочитанного файла (представления, без копий)"""
+        if rows is None:
+            return self
+        return Trace(self.header, self.body[rows.start: rows.stop], rows.start, self.body[:rows.head])
+
+
+class _HashingReader(io.RawIOBase):
+    """Байты файла проходят через sha1 по мере чтения"""
+
+    def __init__(self, raw: io.RawIOBase) -> None:
+        self.raw = raw
+        self.digest = sha1()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer) or 0
+        self.digest.update(memoryview(buffer)[:n])
+        return n
+
+    def hexdigest(self) -> str:
+        """Хэш всего файла: непрочитанный остаток дочитывается без разбора"""
+        for block in iter(lambda: self.raw.read(1 << 20), b""):
+            self.digest.update(block)
+        return self.digest.hexdigest()
+
+
+class TraceReader:
+    """Чтение файла УИДТ за один проход.
+
+    Заголовок разбирается построчно, после чего числовая часть файла читается
+    блоками по block_rows строк в заранее выделенный массив float32.
+    """
+
+    def __init__(self, block_rows: int = 256) -> None:
+        self.block_rows = block_rows
+
+    @staticmethod
+    def _parse_section(line: str) -> tuple[str, dict[str, str]]:
+        name, *items = line.strip().split(";")
+        values = dict(item.split("=", 1) for item in items if "=" in item)
+        return name.strip("[]"), values
+
+    def read_header(self, f: TextIO) -> TraceHeader:
+        sections: dict[str, dict[str, str]] = {}
+        distances = np.empty(0)
+        for i, line in enumerate(f):
+            if line.startswith("["):
+                name, values = TraceReader._parse_section(line)
+                sections[name] = values
+            elif line.startswith("Point"):
+                distances = np.array(line.strip().split(";")[1:], dtype=float)
+            elif line.split(";")[0] == "Length:":
+                freqs = np.array(line.strip().split(";f(MHz)=")[1:], dtype=np.float32)
+                info, reflect, freq = sections["INFO"], sections["REFLECT"], sections["FREQ"]
+                return TraceHeader(
+                    date=info.get("date", ""),
+                    time=info.get("time", ""),
+                    points=int(reflect["points"]),
+                    summ_count=int(reflect["summ_count"]),
+                    datarate=int(reflect["datarate"]),
+                    freq_start=float(freq["start"]),
+                    freq_end=float(freq["end"]),
+                    freq_step=float(freq["step"]),
+                    distances=distances,
+                    freqs=freqs,
+                    header_rows=i + 1,
+                    sections=sections,
+                )
+        raise ValueError("Header not found in file.")
+
+    def is_complete(self, path: Path) -> bool:
+        """Запись файла закончена: последняя строка тела завершена переводом строки
+        и относится к последней точке из Point distances.
+
+        Читаются только заголовок и хвост файла, а не всё тело: проверка выполняется
+        для каждого файла при запуске и в мониторинге. Если Point distances в заголовке
+        нет, строки тела считаются целиком и сравниваются с points из [REFLECT].
+        """
+        try:
+            with path.open() as f:
+                header = self.read_header(f)
+            with path.open("rb") as f:
+                if header.distances.size == 0:
+                    newlines = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+                    return newlines - header.header_rows >= header.points
+                last = TraceReader._last_line(f)
+            if last is None:
+                return False
+            return float(last.split(b";", 1)[0]) == header.distances[-1]
+        except (OSError, ValueError, KeyError, IndexError):
+            # Заголовок ещё не дописан или последняя строка не число
+            return False
+
+    @staticmethod
+    def _last_line(f: BinaryIO, chunk: int = 1 << 16) -> bytes | None:
+        """Последняя строка файла без перевода строки; None, если она не завершена"""
+        end = f.seek(0, io.SEEK_END)
+        tail = b""
+        pos = end
+        while pos > 0:
+            step = min(chunk, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            if not tail.endswith(b"\n"):
+                return None
+            start = tail.rfind(b"\n", 0, len(tail) - 1)
+            if start != -1:
+                return tail[start + 1:-1]
+        return tail[:-1] if tail else None
+
+    def _load_block(self, f: TextIO, n_cols: int, max_rows: int) -> np.ndarray:
+        with warnings.catch_warnings():
+            # Пустой блок в конце файла - штатная ситуация
+            warnings.simplefilter("ignore", UserWarning)
+            return np.loadtxt(f, delimiter=";", usecols=range(n_cols), dtype=np.float32,
+                              max_rows=max_rows, ndmin=2)
+
+    def _read_body(self, f: TextIO, header: TraceHeader, limit: int | None = None) -> np.ndarray:
+        """Строки тела файла с текущей позиции: до конца файла или не больше limit"""
+        n_cols = header.freqs.size + 1
+        # Порядок F, как у polars.DataFrame.to_numpy: от порядка суммирования при нормировке
+        # по балласту в float32 зависят результаты
+        capacity = header.points if limit is None else min(header.points, limit)
+        out = np.empty((max(capacity, 1), n_cols), dtype=np.float32, order="F")
+        n_rows = 0
+        while limit is None or n_rows < limit:
+            max_rows = self.block_rows if limit is None else min(self.block_rows, limit - n_rows)
+            block = self._load_block(f, n_cols, max_rows)
+            if block.shape[0] == 0:
+                break
+            if n_rows + block.shape[0] > out.shape[0]:
+                # Строк больше, чем заявлено в заголовке
+                grown = np.empty((2 * (n_rows + block.shape[0]), n_cols), dtype=np.float32, order="F")
+                grown[:n_rows] = out[:n_rows]
+                out = grown
+            out[n_rows: n_rows + block.shape[0]] = block
+            n_rows += block.shape[0]
+        return out if n_rows == out.shape[0] else np.asfortranarray(out[:n_rows])
+
+    def _read_window(self, f: TextIO, header: TraceHeader, rows: RowWindow) -> Trace:
+        if rows.start <= rows.head:
+            # Окно рядом с балластом - читаем подряд от начала
+            body = self._read_body(f, header, max(rows.head, rows.stop))
+            return Trace(header, body[rows.start: rows.stop], rows.start, body[:rows.head])
+        ballast = self._read_body(f, header, rows.head)
+        # Строки до окна только пропускаем, без разбора чисел
+        deque(islice(f, rows.start - rows.head), maxlen=0)
+        return Trace(header, self._read_body(f, header, rows.stop - rows.start), rows.start, ballast)
+
+    def read(self, path: Path, window: Callable[[TraceHeader], RowWindow | None] | None = None) -> Trace:
+        """Чтение файла целиком или, если задан window, только строк window(заголовок).
+        Заодно считается header.content_hash"""
+        with path.open("rb", buffering=0) as raw:
+            hashing = _HashingReader(raw) # type: ignore
+            with io.TextIOWrapper(io.BufferedReader(hashing)) as f:
+                header = self.read_header(f)
+                rows = None if window is None else window(header)
+                trace = self._read_window(f, header, rows) if rows is not None else Trace(header, self._read_body(f, header))
+                header.content_hash = hashing.hexdigest()
+        return trace
@@ -0,0 +1,149 @@
+from hashlib import sha1
+from pathlib import Path
+from datetime import datetime
+import json
+import threading
+
+import numpy as np
+
+
+class Manifest:
+    """Журнал обработанных файлов в формате JSON lines.
+
+    Для каждого файла хранится хэш содержимого, хэш параметров обработки,
+    список созданных файлов и найденные частоты f0. Файл считается обработанным,
+    если совпадают оба хэша и на месте все файлы, которые должны были быть созданы
+    (expected, в том числе графики из очереди). Графики, построенные в фоне, вносятся
+    в artifacts через add_artifacts, когда они уже записаны на диск; если график
+    отброшен очередью, файла нет и при следующем запуске файл обрабатывается заново.
+    archived - пики файла уже в архиве Archive: отмечается mark_archived после
+    записи части архива, поэтому после сбоя неотмеченные файлы дописываются в архив.
+
+    Полная запись (с f0) пишется один раз при обработке файла, add_artifacts и
+    mark_archived дописывают короткие строки {"file", "delta": {...}}. При чтении
+    журнала дельты применяются к записям, и если в журнале есть устаревшие строки
+    (дельты, записи повторно обработанных файлов), он переписывается по одной строке на файл.
+    """
+
+    def __init__(self, path: Path, params_hash: str) -> None:
+        self.path = path
+        self.params_hash = params_hash
+        self._records: dict[str, dict] | None = None
+        # Графики, построенные раньше, чем файл попал в журнал
+        self._early_artifacts: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        digest = sha1()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _apply(record: dict, delta: dict) -> dict:
+        return {**record, **delta, "artifacts": record["artifacts"] + delta.get("artifacts", [])}
+
+    def _load(self) -> dict[str, dict]:
+        if self._records is None:
+            self._records = {}
+            if not self.path.is_file():
+                return self._records
+            n_lines = 0
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    n_lines += 1
+                    record = json.loads(line)
+                    if "delta" not in record:
+                        self._records[record["file"]] = record
+                    elif record["file"] in self._records:
+                        self._records[record["file"]] = Manifest._apply(self._records[record["file"]],
+                                                                          record["delta"])
+            if n_lines > len(self._records):
+                self._compact()
+        return self._records
+
+    def _compact(self) -> None:
+        """Переписать журнал по одной строке на файл (через временный файл)"""
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for record in self._records.values(): # type: ignore
+                f.write(json.dumps(record) + "\n")
+        tmp.replace(self.path)
+
+    def _content_hash(self, path: Path, record: dict | None) -> str:
+        stat = path.stat()
+        # Если размер и время изменения не поменялись, файл повторно не хэшируем
+        if record is not None and (record["size"], record["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return record["content_hash"]
+        return Manifest.file_hash(path)
+
+    def lookup(self, path: Path) -> dict | None:
+        """Запись о файле, если он уже обработан с текущими параметрами"""
+        with self._lock:
+            record = self._load().get(path.name)
+        if record is None or record["params_hash"] != self.params_hash:
+            return None
+        if self._content_hash(path, record) != record["content_hash"]:
+            return None
+        expected = record.get("expected", record["artifacts"])
+        if not all((path.parent / artifact).is_file() for artifact in expected):
+            return None
+        return record
+
+    def add(self, path: Path, artifacts: list[Path], f0: np.ndarray, length: np.ndarray,
+            trace_time: datetime | None = None, content_hash: str | None = None,
+            pending: list[Path] | None = None) -> None:
+        """content_hash - хэш, посчитанный при чтении файла (TraceHeader.content_hash),
+        без него файл перечитывается. pending - файлы, которые ещё будут созданы (графики в очереди)"""
+        stat = path.stat()
+        record = {
+            "file": path.name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_hash": content_hash or Manifest.file_hash(path),
+            "params_hash": self.params_hash,
+            "artifacts": [str(a.relative_to(path.parent)) for a in artifacts],
+            "expected": [str(a.relative_to(path.parent)) for a in [*artifacts, *(pending or [])]],
+            "f0": f0.tolist(),
+            "length": length.tolist(),
+            "trace_time": None if trace_time is None else trace_time.isoformat(),
+            "archived": False,
+        }
+        with self._lock:
+            record["artifacts"] += self._early_artifacts.pop(path.name, [])
+            self._write(record)
+
+    def add_artifacts(self, path: Path, artifacts: list[Path]) -> None:
+        """Дописать в запись файла созданные позже файлы (графики из RenderQueue)"""
+        names = [str(a.relative_to(path.parent)) for a in artifacts]
+        with self._lock:
+            record = self._load().get(path.name)
+            if record is None:
+                self._early_artifacts.setdefault(path.name, []).extend(names)
+                return
+            self._write_delta(path.name, {"artifacts": names})
+
+    def mark_archived(self, path: Path) -> None:
+        with self._lock:
+            record = self._load().get(path.name)
+            if record is not None and not record.get("archived", False):
+                self._write_delta(path.name, {"archived": True})
+
+    def _append(self, line: dict) -> None:
+        self.path.parent.mkdir(exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+
+    def _write(self, record: dict) -> None:
+        # При чтении журнала более поздняя запись о файле заменяет раннюю
+        self._load()[record["file"]] = record
+        self._append(record)
+
+    def _write_delta(self, name: str, delta: dict) -> None:
+        records = self._load()
+        records[name] = Manifest._apply(records[name], delta)
+        self._append({"file": name, "delta": delta})
@@ -0,0 +1,114 @@
+from datetime import date, datetime
+from pathlib import Path
+from time import monotonic
+from typing import Callable
+import threading
+
+import numpy as np
+
+from src.metrics.metrics import timed
+
+
+class PeakArchive:
+    """Архив пиков всех сессий в формате Parquet с разбиением по дате и сессии.
+
+    Строки (file, trace_time, distance, f0) копятся в буфере и, как в PeakSaver,
+    сбрасываются после flush_every файлов или через flush_interval секунд - каждый
+    сброс создаёт файл Archive/date=ГГГГ-ММ-ДД/session=<время запуска>/part-NNNNN.parquet.
+    Дата - дата записи файла УИДТ из [INFO] (или время обработки, если её нет).
+    Существующие файлы не переписываются, поэтому архив можно читать во время работы.
+    on_flush(sources) вызывается после записи части с исходными файлами попавших в неё
+    пиков (source в add) - по нему Processor отмечает файлы в журнале как заархивированные.
+    query читает архив лениво (polars.scan_parquet): разбиения по дате за пределами
+    запрошенного интервала и строки вне диапазона расстояний не читаются.
+    """
+    DIR_NAME = "Archive"
+
+    def __init__(self, session: str, flush_every: int = 10, flush_interval: float = 30,
+                 on_flush: Callable[[list[Path]], None] | None = None) -> None:
+        self.session = session
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.parts: list[Path] = []
+        self._buffer: list[tuple[Path, str, datetime, np.ndarray, np.ndarray]] = []
+        self._sources: list[Path] = []
+        self._last_flush = monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, root: Path, name: str, trace_time: datetime | None,
+            length: np.ndarray, f0: np.ndarray, source: Path | None = None) -> None:
+        """Пики файла name в архив папки root / Archive"""
+        with self._lock:
+            if source is not None and source in self._sources:
+                # Файл уже ждёт записи (повторно восстановлен из журнала до сброса)
+                return
+            self._buffer.append((root / PeakArchive.DIR_NAME, name, trace_time or datetime.now(),
+                                 np.asarray(length, dtype=np.float64), np.asarray(f0, dtype=np.float64)))
+            if source is not None:
+                self._sources.append(source)
+            if len(self._buffer) >= self.flush_every:
+                self._flush()
+
+    def flush_if_due(self) -> None:
+        with self._lock:
+            if self._buffer and monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    @timed("save.archive")
+    def _flush(self) -> None:
+        import polars as pl
+
+        groups: dict[tuple[Path, date], list] = {}
+        for archive, name, trace_time, length, f0 in self._buffer:
+            groups.setdefault((archive, trace_time.date()), []).append(pl.DataFrame({
+                "file": pl.Series([name] * length.size, dtype=pl.String),
+                "trace_time": pl.Series([trace_time] * length.size, dtype=pl.Datetime("us")),
+                "distance": length,
+                "f0": f0,
+            }))
+        for (archive, day), frames in groups.items():
+            part_dir = archive / f"date={day.isoformat()}" / f"session={self.session}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            path = part_dir / f"part-{len(self.parts):05d}.parquet"
+            # Сначала во временный файл: читатели архива не увидят недописанный part
+            tmp = path.with_suffix(".tmp")
+            pl.concat(frames).sort("trace_time", "distance").write_parquet(tmp, statistics=True)
+            tmp.replace(path)
+            self.parts.append(path)
+        self._buffer.clear()
+        self._last_flush = monotonic()
+        sources, self._sources = self._sources, []
+        if self.on_flush is not None and sources:
+            self.on_flush(sources)
+
+    @staticmethod
+    def query(archive: Path, distance_from: float | None = None, distance_to: float | None = None,
+              since: datetime | None = None, until: datetime | None = None,
+              session: str | None = None):
+        """Пики из архива: polars.DataFrame (trace_time, distance, f0, file, session),
+        упорядоченный по времени и расстоянию"""
+        import polars as pl
+
+        lazy = pl.scan_parquet(archive / "**" / "*.parquet", hive_partitioning=True,
+                               hive_schema={"date": pl.Date, "session": pl.String})
+        predicates = []
+        # Условие на date отсекает разбиения целиком, не открывая файлы
+        if since is not None:
+            predicates += [pl.col("date") >= since.date(), pl.col("trace_time") >= since]
+        if until is not None:
+            predicates += [pl.col("date") <= until.date(), pl.col("trace_time") <= until]
+        if distance_from is not None:
+            predicates.append(pl.col("distance") >= distance_from)
+        if distance_to is not None:
+            predicates.append(pl.col("distance") <= distance_to)
+        if session is not None:
+            predicates.append(pl.col("session") == session)
+        if predicates:
+            lazy = lazy.filter(*predicates)
+        return (lazy.select("trace_time", "distance", "f0", "file", "session")
+                .sort("trace_time", "distance").collect())
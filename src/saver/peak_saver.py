@@ -1,35 +1,114 @@
 from pathlib import Path
 from datetime import datetime
+from time import monotonic
+import threading
 
 import numpy as np
 
+from src.metrics.metrics import timed
+from src.processing.stats_computer import RollingStats
+
 class PeakSaver:
-    def __init__(self, output_dir: Path):
+    """Потоковое сохранение пиков.
+
+    Каждый файл дописывается в длинную таблицу <время запуска>_long.csv (file;distance;f0)
+    в папке Peaks: строки копятся в буфере и сбрасываются на диск после flush_every файлов
+    или через flush_interval секунд, поэтому таблицу можно читать во время работы,
+    а при аварийном завершении теряется не больше одного буфера. save_file дополнительно
+    выгружает широкую таблицу в прежнем формате (столбец длины и по столбцу на файл).
+    """
+    LONG_HEADER = "file;distance;f0\n"
+
+    def __init__(self, output_dir: Path, flush_every: int = 10, flush_interval: float = 30):
         self.output_dir = output_dir
+        # Папка, в которой создаётся output_dir, если результаты пишутся не рядом с файлами
+        self.root: Path | None = None
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
 
         # Возможно, лучше поставить время окончания эсперимента
         self.fname = (datetime.now().strftime("%Y_%m_%d__%H_%M_%S.%f") + ".csv")
-        self.peaks: list[np.ndarray] = []
-        self.peaks_names: list[str] = []
-        self.length: np.ndarray 
+        self.long_paths: list[Path] = []
+        self._buffer: list[tuple[Path, str]] = []
+        self._last_flush = monotonic()
+        self._lock = threading.Lock()
+
+    def long_path(self) -> Path:
+        return self.output_dir / f"{Path(self.fname).stem}_long.csv"
 
     def add_peak(self, peaks: np.ndarray, peak_name: str, length: np.ndarray) -> None:
-        self.peaks.append(peaks)
-        self.peaks_names.append(peak_name)
-        self.length = length
+        rows = "".join(f"{peak_name};{d};{f}\n" for d, f in zip(length, peaks))
+        with self._lock:
+            self._buffer.append((self.long_path(), rows))
+            if len(self._buffer) >= self.flush_every:
+                self._flush()
+
+    def flush_if_due(self) -> None:
+        """Сброс буфера, если с прошлого сброса прошло flush_interval секунд"""
+        with self._lock:
+            if self._buffer and monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
 
-    def _find_max_len_peak(self) -> int:
-        return max(peak.size for peak in self.peaks) + 1
+    @timed("save.flush")
+    def _flush(self) -> None:
+        for path, rows in self._buffer:
+            if path not in self.long_paths:
+                path.parent.mkdir(exist_ok=True)
+                path.write_text(PeakSaver.LONG_HEADER, encoding="utf-8")
+                self.long_paths.append(path)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(rows)
+        self._buffer.clear()
+        self._last_flush = monotonic()
 
+    def stats_path(self, fname: Path) -> Path:
+        return (self.root or fname.parent) / self.output_dir.name / f"{fname.stem}_stats.csv"
+
+    def save_stats(self, fname: Path, length: np.ndarray, stats: dict[int, RollingStats]) -> None:
+        """Скользящие статистики файла: столбец длины и по столбцу на статистику и окно"""
+        columns = {"Длина": length}
+        for window_stats in stats.values():
+            columns.update(window_stats.columns())
+
+        save_path = self.stats_path(fname)
+        save_path.parent.mkdir(exist_ok=True)
+        np.savetxt(save_path, np.column_stack(list(columns.values())), fmt="%.6f", delimiter=";",
+                   header=";".join(columns), comments="", encoding="utf-8")
+
+    def _read_long(self) -> list[tuple[str, np.ndarray, np.ndarray]]:
+        """Пики всех файлов сессии: (имя, длина, f0) в порядке добавления"""
+        import polars as pl
+        frames = [pl.read_csv(path, separator=";", schema={"file": pl.String, "distance": pl.Float64,
+                                                             "f0": pl.Float64})
+                  for path in self.long_paths]
+        if not frames:
+            return []
+        # Повторно обработанный файл - отдельный столбец, как и раньше
+        df = pl.concat(frames).with_columns(
+            (pl.col("file") != pl.col("file").shift()).fill_null(True).cum_sum().alias("run"))
+        return [(group["file"][0], group["distance"].to_numpy(), group["f0"].to_numpy())
+                for group in df.partition_by("run", maintain_order=True)]
+
+    @timed("save.export")
     def save_file(self):
-        data = np.zeros((self._find_max_len_peak(), len(self.peaks) + 1), dtype=object)
-        data[0, 1:] = self.peaks_names
+        """Выгрузка широкой таблицы (как раньше) по всем дописанным пикам"""
+        self.flush()
+        peaks = self._read_long()
+        if not peaks:
+            return
+        length = peaks[-1][1]
+
+        data = np.zeros((max(peak.size for _, _, peak in peaks) + 1, len(peaks) + 1), dtype=object)
+        data[0, 1:] = [name for name, _, _ in peaks]
         data[0, 0] = "Длина"
 
-        
-        data[1: self.length.size + 1, 0] = self.length
+        data[1: length.size + 1, 0] = length
 
-        for i, peak in enumerate(self.peaks):
+        for i, (_, _, peak) in enumerate(peaks):
             data[1: peak.size + 1, i + 1] = peak
             
         self.output_dir.mkdir(exist_ok=True)
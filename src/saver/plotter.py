@@ -1,141 +1,304 @@
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
+from matplotlib.image import imsave
 from pathlib import Path
+from copy import copy
+from typing import Callable
+import threading
 import numpy as np
 from matplotlib.ticker import MultipleLocator
 
+from src.metrics.metrics import timed
+from src.processing.stats_computer import RollingStats
+
+# Шаблоны фигур создаются один раз на поток (процесс отрисовки) и переиспользуются для всех файлов
+_templates = threading.local()
+
+
+class _ReflectogramTemplate:
+    """Фигура рефлектограммы со срезами: оси, изображение и линии создаются один раз,
+    для нового файла обновляются только данные."""
+    labels = ["Начало", "Срез", "Конец"]
+
+    def __init__(self) -> None:
+        self.fig = Figure(figsize=(12, 6))
+        FigureCanvasAgg(self.fig)
+        ax = self.fig.subplots(2, 4, gridspec_kw={
+                                  'width_ratios': [5, 1, 1, 1],
+                                  'height_ratios': [5, 1]
+                              })
+        for i in range(1, 4):
+            self.fig.delaxes(ax[1, i])
+        self.ax = ax
+
+        self.image = ax[0, 0].imshow(np.zeros((2, 2)), aspect="auto")
+        self.peaks_line, = ax[0, 0].plot([], [], c='k')
+        self.freq_line = ax[0, 0].axhline(0, c="lightgreen", lw=1)
+        self.marks = [ax[0, 0].axvline(0, color='r', lw=1) for _ in range(3)]
+        ax[0, 0].set_ylabel("Частота, МГц")
+        ax[0, 0].grid(which="both")
+
+        self.slice_line, = ax[1, 0].plot([], [])
+        ax[1, 0].set_xlabel("Расстояние, м")
+        ax[1, 0].grid(which="both")
+
+        self.side_lines = []
+        for i, label in enumerate(self.labels):
+            side = ax[0, i + 1]
+            self.side_lines.append((side.plot([], [])[0], side.plot([], [], c='r')[0]))
+            side.set_xlabel(label)
+            side.tick_params(axis='y', left=False, labelleft=False)
+            side.xaxis.set_minor_locator(MultipleLocator(0.2))
+            side.grid(which="both")
+
+        self.title = self.fig.suptitle("")
+
+
+class _StdTemplate:
+    def __init__(self) -> None:
+        self.fig = Figure()
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.lines = [self.ax.plot([], [], c='k')[0]]
+        self.title = self.fig.suptitle("")
+        self.ax.grid(which="both")
+        self.ax.set_xlabel("Расстояние, м")
+        self.ax.set_ylabel("СКО, МГц")
+
+
+class _DriftTemplate:
+    def __init__(self) -> None:
+        self.fig = Figure(figsize=(12, 4))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.last_line, = self.ax.plot([], [], c='lightgray', label="Последний файл")
+        self.mean_line, = self.ax.plot([], [], c='k', label="Среднее за сессию")
+        self.ewma_line, = self.ax.plot([], [], c='r', label="Экспоненциальное среднее")
+        self.std_lines = [self.ax.plot([], [], c='k', ls='--', lw=0.8)[0] for _ in range(2)]
+        self.ax.axhline(0, c='gray', lw=0.8)
+        self.ax.legend(loc="upper right")
+        self.title = self.fig.suptitle("")
+        self.ax.grid(which="both")
+        self.ax.set_xlabel("Расстояние, м")
+        self.ax.set_ylabel("Δf0, МГц")
+
+
+def _get_template(name: str, factory: Callable):
+    if not hasattr(_templates, name):
+        setattr(_templates, name, factory())
+    return getattr(_templates, name)
+
+
+def _make_lut() -> np.ndarray:
+    """Таблица цветов палитры по умолчанию: 256 значений RGB"""
+    return (colormaps[matplotlib.rcParams["image.cmap"]](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+
+
 class Plotter:
     def __init__(self, freq_cut: int, point_cut: float, point_start: float,
                  point_end: float, dx: float, output_dir: Path,
-                 transparency: float=0.5):
+                 transparency: float=0.5, dpi: int=300, fmt: str="png", mode: str="full"):
         self.output_dir = output_dir
+        self.dpi = dpi
+        self.fmt = fmt
+        self.mode = mode
         self.freq_cut = freq_cut
         self.point_cut = point_cut
         self.point_start = point_start
         self.point_end = point_end
         self.dx = dx
+        self.offset = 0
         self.transparency = transparency
 
+    def for_file(self, output_dir: Path, dx: float, point_end: float, offset: int = 0) -> "Plotter":
+        """Копия с настройками конкретного файла, исходный объект не меняется.
+        offset - номер строки файла, с которой начинаются данные (окно lazy_roi)"""
+        plotter = copy(self)
+        plotter.output_dir = output_dir
+        plotter.dx = dx
+        plotter.point_end = point_end
+        plotter.offset = offset
+        return plotter
+
+    def save_path(self, fname: Path) -> Path:
+        return self.output_dir / f"{fname.stem}.{self.fmt}"
+
+    @staticmethod
+    def _norm(data: np.ndarray) -> np.ndarray:
+        """Нормировка каждой точки линии на [0, 1]. Возвращает копию (частота, расстояние)"""
+        data_norm = data.T.copy()
+        data_norm -= data_norm.min(axis=0)
+        data_norm /= data_norm.max(axis=0)
+        return data_norm
+
+    @timed("plot.reflectogram")
     def create_plot(self, data: np.ndarray, freqs: np.ndarray, length: np.ndarray,
                     f0: np.ndarray, fname: Path, laplace: np.ndarray) -> Path:
-            
-        fig, ax = plt.subplots(2, 4, 
-                              gridspec_kw={
-                                  'width_ratios': [5, 1, 1, 1], 
-                                  'height_ratios': [5, 1]
-                              },
-                              figsize=(12, 6))
-        
-        for i in range(1, 4): 
-            fig.delaxes(ax[1, i])
-        
-        self._plot_reflectograms(ax[0, 0], data, freqs, length, f0)
-        
-        self._plot_additional_slices(ax, data, freqs, length, laplace)
-
-        self._add_title(fig, fname)
-        
-        save_path = self.output_dir / f"{fname.stem}.png"
-
+        save_path = self.save_path(fname)
         self.output_dir.mkdir(exist_ok=True)
 
-        plt.savefig(save_path, dpi=300, bbox_inches='tight', pad_inches=0.1)
-        plt.close()
+        data_norm = Plotter._norm(data)
+
+        if self.mode == "fast":
+            self._save_heatmap(save_path, data_norm, freqs, f0)
+            return save_path
+
+        template = _get_template("reflectogram", _ReflectogramTemplate)
+        self._plot_reflectograms(template, data_norm, freqs, length, f0)
+        self._plot_additional_slices(template, data, data_norm, freqs, length, laplace)
+        self._add_title(template, fname)
+
+        template.fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight', pad_inches=0.1)
         return save_path
-    
-    def _add_title(self, fig: Figure, fname: Path) -> None:
-        fig.suptitle(fname.stem)
+
+    def _add_title(self, template: _ReflectogramTemplate, fname: Path) -> None:
+        template.title.set_text(fname.stem)
 
     def _get_index(self, length: float) -> int:
-        return int(length / self.dx)
+        return int(length / self.dx) - self.offset
+
+    def _get_point_end(self, n_points: int) -> float:
+        return min(self.point_end, (self.offset + n_points) * self.dx - self.dx)
+
+    def _save_heatmap(self, save_path: Path, data_norm: np.ndarray, freqs: np.ndarray,
+                      peaks_freq: np.ndarray) -> None:
+        """Быстрый режим: только рефлектограмма пиксель в пиксель, без вёрстки matplotlib"""
+        image = data_norm[::-1, self._get_index(self.point_start):
+                          self._get_index(self._get_point_end(data_norm.shape[1]))]
+        lut = _get_template("lut", _make_lut)
+        rgb = lut[np.nan_to_num(image * 255).clip(0, 255).astype(np.uint8)]
+
+        # Найденные пики отмечаем чёрными точками
+        rows = np.rint((freqs.max() - peaks_freq) / (freqs.max() - freqs.min()) * (image.shape[0] - 1))
+        valid = np.isfinite(rows)
+        rgb[rows[valid].astype(int).clip(0, image.shape[0] - 1), np.flatnonzero(valid)] = 0
+
+        imsave(save_path, rgb)
+
+    def _plot_reflectograms(self, template: _ReflectogramTemplate, data_norm: np.ndarray,
+                            freqs: np.ndarray, length: np.ndarray, peaks_freq: np.ndarray):
+        ax = template.ax[0, 0]
+        point_end = self._get_point_end(data_norm.shape[1])
+
+        image = data_norm[::-1, self._get_index(self.point_start): self._get_index(point_end)]
+        template.image.set_data(image)
+        template.image.set_extent((self.point_start, point_end, freqs.min(), freqs.max()))
+        template.image.set_clim(np.nanmin(image), np.nanmax(image))
+
+        template.peaks_line.set_data(length[self._get_index(self.point_start): self._get_index(point_end)],
+                                     peaks_freq)
+        template.peaks_line.set_alpha(self.transparency)
+
+        template.freq_line.set_ydata([self.freq_cut, self.freq_cut])
+
+        for line, mark in zip(template.marks, [self.point_cut, self.point_start, point_end]):
+            x = length[min(self._get_index(mark), length.size - 1)]
+            line.set_xdata([x, x])
 
-    def _plot_reflectograms(self, ax: plt.Axes, data: np.ndarray, freqs: np.ndarray, # type: ignore
-                            length: np.ndarray, peaks_freq: np.ndarray):  
-        point_end = min(self.point_end, data.shape[0] * self.dx - self.dx)
-        
-        data_norm = data.T.copy()
-        data_norm -= data_norm.min(axis=0)
-        data_norm /= data_norm.max(axis=0)
-        
-        ax.imshow(
-            data_norm[::-1, self._get_index(self.point_start): 
-                      self._get_index(point_end)],
-            aspect="auto",
-            extent=(self.point_start,
-                    point_end,
-                    freqs.min(),
-                    freqs.max()
-                    )
-                    )
-
-        ax.plot(length[self._get_index(self.point_start): self._get_index(point_end)],
-                peaks_freq,
-                alpha=self.transparency,
-                c='k')
-        
-        ax.axhline(self.freq_cut, c="lightgreen", lw=1)
-
-        for mark in [self.point_cut, self.point_start, point_end]:
-            ax.axvline(length[min(self._get_index(mark), length.size - 1)], color='r', lw=1)
-            
-        ax.set_ylabel("Частота, МГц")
         ax.set_xlim(self.point_start, point_end)
-        ax.grid(which="both")
-    
-    def _plot_additional_slices(self, ax: plt.Axes, data: np.ndarray,
-                                freqs: np.ndarray, length: np.ndarray, laplace: np.ndarray):
+        ax.set_ylim(freqs.min(), freqs.max())
+
+    def _plot_additional_slices(self, template: _ReflectogramTemplate, data: np.ndarray,
+                                data_norm: np.ndarray, freqs: np.ndarray, length: np.ndarray,
+                                laplace: np.ndarray):
         """Отрисовка дополнительных срезов"""
-        labels = ["Начало", "Срез", "Конец"]
+        ax = template.ax
 
-        point_end = min(self.point_end, data.shape[0] * self.dx - self.dx)
+        point_end = self._get_point_end(data.shape[0])
 
         ind_freq = int((self.freq_cut - freqs[0]) / abs(freqs[1] - freqs[0]))
-        ax[1, 0].plot(length[self._get_index(self.point_start): self._get_index(point_end)],
-                      data[self._get_index(self.point_start): self._get_index(point_end),
-                        ind_freq])
-        
         data_tmp = data[self._get_index(self.point_start): self._get_index(point_end), ind_freq]
+        template.slice_line.set_data(length[self._get_index(self.point_start): self._get_index(point_end)],
+                                     data_tmp)
         ax[1, 0].yaxis.set_major_locator(MultipleLocator(data_tmp.max() - data_tmp.min()))
         ax[1, 0].yaxis.set_minor_locator(MultipleLocator((data_tmp.max() - data_tmp.min()) / 5))
-
+        ax[1, 0].relim()
+        ax[1, 0].autoscale_view()
         ax[1, 0].set_xlim(self.point_start, point_end)
-        ax[1, 0].set_xlabel("Расстояние, м")
-        ax[1, 0].grid(which="both")
-
-        data_norm = data.T
-        data_norm -= data_norm.min(axis=0)
-        data_norm /= data_norm.max(axis=0)
 
         for i, mark in enumerate([self.point_start, self.point_cut, point_end]):
-            ax[0, i + 1].plot(data_norm.T[self._get_index(mark)], freqs)
-            ax[0, i + 1].plot(laplace[i], freqs, c='r')
+            data_line, laplace_line = template.side_lines[i]
+            data_line.set_data(data_norm[:, self._get_index(mark)], freqs)
+            laplace_line.set_data(laplace[i], freqs)
+            ax[0, i + 1].relim()
+            ax[0, i + 1].autoscale_view()
             ax[0, i + 1].set_ylim(freqs.min(), freqs.max())
-            ax[0, i + 1].set_xlabel(labels[i])
-            ax[0, i + 1].tick_params(axis='y', left=False, labelleft=False)
-            ax[0, i + 1].xaxis.set_minor_locator(MultipleLocator(0.2))
-            ax[0, i + 1].grid(which="both")
-            
+
 
 class PlotterStats:
-    def __init__(self, output_dir: Path, max: float=20):
+    def __init__(self, output_dir: Path, max: float=20, dpi: int=300, fmt: str="png"):
         self.output_dir = output_dir
         self.max = max
+        self.dpi = dpi
+        self.fmt = fmt
+
+    def for_file(self, output_dir: Path) -> "PlotterStats":
+        plotter = copy(self)
+        plotter.output_dir = output_dir
+        return plotter
+
+    def _add_title(self, template: _StdTemplate, fname: Path) -> None:
+        template.title.set_text(fname.stem)
+
+    def save_path(self, fname: Path) -> Path:
+        return self.output_dir / f"{fname.stem}_std.{self.fmt}"
+
+    @timed("plot.std")
+    def plot_std(self, stats: dict[int, RollingStats], length: np.ndarray, fname: Path) -> Path:
+        """СКО для каждого окна, при нескольких окнах - с легендой"""
+        template = _get_template("std", _StdTemplate)
 
-    def _add_title(self, fig: Figure, fname: Path) -> None:
-        fig.suptitle(fname.stem)
+        while len(template.lines) < len(stats):
+            template.lines.append(template.ax.plot([], [])[0])
+        for line in template.lines[len(stats):]:
+            line.set_data([], [])
+        for line, window_stats in zip(template.lines, stats.values()):
+            line.set_data(length, window_stats.std)
+            line.set_label(f"Окно {window_stats.window}")
+        legend = template.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if len(stats) > 1:
+            template.ax.legend(handles=template.lines[:len(stats)])
+        self._add_title(template, fname)
+        template.ax.relim()
+        template.ax.autoscale_view()
+        template.ax.set_ylim(0, self.max)
 
-    def plot_std(self, data: np.ndarray, length: np.ndarray, fname: Path):
-        fig, ax = plt.subplots()
+        save_path = self.save_path(fname)
+        self.output_dir.mkdir(exist_ok=True)
+        template.fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight', pad_inches=0.1)
+        return save_path
+
+
+class PlotterDrift:
+    """Накопленный за сессию дрейф f0 относительно опорной линии"""
+    def __init__(self, output_dir: Path, dpi: int=300, fmt: str="png"):
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.fmt = fmt
+
+    def save_path(self) -> Path:
+        return self.output_dir / f"session_drift.{self.fmt}"
 
-        ax.plot(length, data, c ='k')
-        self._add_title(fig, fname)
-        ax.grid(which="both")
-        ax.set_xlabel("Расстояние, м")
-        ax.set_ylabel("СКО, МГц")
-        ax.set_ylim(0, self.max)
+    @timed("plot.drift")
+    def plot_drift(self, length: np.ndarray, last: np.ndarray, mean: np.ndarray, ewma: np.ndarray,
+                   std: np.ndarray, files: int) -> Path:
+        """Все кривые - отклонения от опорной линии, среднее - с полосой ± СКО"""
+        template = _get_template("drift", _DriftTemplate)
+        template.last_line.set_data(length, last)
+        template.mean_line.set_data(length, mean)
+        template.ewma_line.set_data(length, ewma)
+        template.std_lines[0].set_data(length, mean - std)
+        template.std_lines[1].set_data(length, mean + std)
+        template.title.set_text(f"Дрейф f0 за сессию, файлов: {files}")
+        template.ax.relim()
+        template.ax.autoscale_view()
 
-        save_path = self.output_dir / f"{fname.stem}_std.png"
-        plt.savefig(save_path, dpi=300, bbox_inches='tight', pad_inches=0.1)
-        plt.close()
\ No newline at end of file
+        save_path = self.save_path()
+        self.output_dir.mkdir(exist_ok=True)
+        template.fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight', pad_inches=0.1)
+        return save_path
@@ -0,0 +1,118 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+import signal
+import threading
+
+import numpy as np
+
+from src.metrics.metrics import Metrics, collect
+from src.processing.stats_computer import RollingStats
+
+if TYPE_CHECKING:
+    # matplotlib загружается вместе с Plotter, только когда графики строятся
+    from src.saver.plotter import Plotter, PlotterStats
+
+
+@dataclass
+class RenderJob:
+    """Всё, что нужно для построения графиков одного файла"""
+    plotter: "Plotter"
+    stats_plotter: "PlotterStats"
+    fname: Path
+    data: np.ndarray
+    freqs: np.ndarray
+    length: np.ndarray
+    f0: np.ndarray
+    laplace: np.ndarray
+    stats: dict[int, RollingStats]
+    length_roi: np.ndarray
+
+    def artifacts(self) -> list[Path]:
+        return [self.plotter.save_path(self.fname), self.stats_plotter.save_path(self.fname)]
+
+
+def _init_render_worker() -> None:
+    # Ctrl+C обрабатывает основной процесс, который дорисовывает очередь в close
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def render(job: RenderJob) -> list[Path]:
+    return [job.plotter.create_plot(job.data, job.freqs, job.length, job.f0, job.fname, job.laplace),
+            job.stats_plotter.plot_std(job.stats, job.length_roi, job.fname)]
+
+
+def _render_with_metrics(job: RenderJob) -> Metrics:
+    with collect() as metrics:
+        render(job)
+    return metrics
+
+
+class RenderQueue:
+    """Фоновое построение графиков в отдельном пуле процессов.
+
+    Очередь ограничена maxsize заданиями. При переполнении policy определяет, что делать:
+    "block" - ждать освобождения места, "drop" - отбросить новое задание,
+    "coalesce" - отбросить самое старое ожидающее задание (остаются графики свежих файлов).
+    on_done(job, metrics) вызывается после построения графиков файла - только для
+    построенных заданий, отброшенные и неудавшиеся не передаются.
+    """
+
+    def __init__(self, workers: int = 1, maxsize: int = 8, policy: str = "coalesce",
+                 on_done: Callable[[RenderJob, Metrics], None] | None = None) -> None:
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_done = on_done
+        self.dropped = 0
+        self._pending: deque[RenderJob] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker)
+        self._dispatchers = [
+            threading.Thread(target=self._run, daemon=True, name=f"RenderDispatcher-{i}")
+            for i in range(workers)
+        ]
+        for d in self._dispatchers:
+            d.start()
+
+    def submit(self, job: RenderJob) -> None:
+        with self._cond:
+            if len(self._pending) >= self.maxsize:
+                if self.policy == "block":
+                    self._cond.wait_for(lambda: len(self._pending) < self.maxsize)
+                elif self.policy == "drop":
+                    self.dropped += 1
+                    print(f"Очередь графиков заполнена, пропускаем {job.fname}")
+                    return
+                else:
+                    old = self._pending.popleft()
+                    self.dropped += 1
+                    print(f"Очередь графиков заполнена, пропускаем {old.fname}")
+            self._pending.append(job)
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+                self._cond.notify_all()
+            try:
+                metrics = self._executor.submit(_render_with_metrics, job).result()
+                if self.on_done is not None:
+                    self.on_done(job, metrics)
+            except Exception as e:
+                print(f"Ошибка построения графиков {job.fname}: {str(e)}")
+
+    def close(self) -> None:
+        """Дорисовываем оставшиеся задания и останавливаем пул"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for d in self._dispatchers:
+            d.join()
+        self._executor.shutdown()
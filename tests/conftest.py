@@ -0,0 +1,55 @@
+"""Общие фикстуры тестов"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.reader.trace_reader import TraceReader
+
+SAMPLE_FILE = Path(__file__).parent.parent / "test_path" / "exp_02_04_2025__16_55_46__468.csv"
+
+
+@pytest.fixture
+def sample_file() -> Path:
+    """Файл УИДТ из test_path; тест пропускается, если файла нет"""
+    if not SAMPLE_FILE.is_file():
+        pytest.skip("нет файла из test_path")
+    return SAMPLE_FILE
+
+
+@pytest.fixture
+def sample_norm(sample_file: Path) -> np.ndarray:
+    """Данные файла из test_path, нормированные по каждой точке линии на [0, 1]"""
+    data = TraceReader().read(sample_file).data.astype(np.float32)
+    data = data - data[:20].mean(axis=0)
+    data -= data.min(axis=1, keepdims=True)
+    return data / data.max(axis=1, keepdims=True)
+
+
+def write_trace(path: Path, data: np.ndarray, dx: float = 2.0, freq_start: float = 10500,
+                freq_step: float = 5, moment: str = "02/04/25;time=16:55:46") -> Path:
+    """Файл УИДТ с заголовком как у прибора и строками data (точки линии, частоты)"""
+    points, n_freqs = data.shape
+    distances = dx * np.arange(points)
+    freqs = freq_start + freq_step * np.arange(n_freqs)
+    lines = [
+        f"[INFO];device=UIDT;version=1.0;date={moment}",
+        f"[REFLECT];points={points};summ_count=1;datarate=1;decimation=0;",
+        "[LASER];period=80600ns;duration=80ns;delay=2000ns;",
+        f"[FREQ];start={freqs[0]:g};end={freqs[-1]:g};step={freq_step:g};",
+        f"Point distances(m) [0, {points - 1}]=;" + ";".join(f"{d:.4f}" for d in distances),
+        "Length:;" + ";".join(f"f(MHz)={f:g}" for f in freqs),
+    ]
+    lines += [f"{d:.4f};" + ";".join(f"{v:.5f}" for v in row) for d, row in zip(distances, data)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def trace_file(tmp_path: Path) -> Path:
+    """Небольшой файл УИДТ: пик Лапласа в каждой строке на слабом шуме"""
+    rng = np.random.default_rng(0)
+    freqs = 10500 + 5 * np.arange(81)
+    mu = rng.uniform(10650, 10750, size=(200, 1))
+    data = 3240 + np.exp(-np.abs(freqs - mu) / 20) + 0.01 * rng.random((200, freqs.size))
+    return write_trace(tmp_path / "exp_02_04_2025__16_55_46__001.csv", data)
@@ -0,0 +1,55 @@
+"""AsyncFileHandler сохраняет результаты по времени записи файлов, а не по времени обработки"""
+import threading
+from pathlib import Path
+from time import sleep
+from types import SimpleNamespace
+
+from src.observer.observer import AsyncFileHandler
+
+
+def test_commit_in_trace_time_order() -> None:
+    times = {Path(f"{i}.csv"): i for i in range(8)}
+    committed = []
+
+    def callback(path: Path) -> SimpleNamespace:
+        # Ранние файлы обрабатываются дольше поздних
+        sleep(0.02 * (len(times) - times[path]))
+        return SimpleNamespace(path=path)
+
+    handler = AsyncFileHandler(callback, max_workers=4, key=times.__getitem__,
+                               commit=lambda result: committed.append(result.path))
+    # Пока блокировка захвачена, обработчики не берут файлы: в очереди все сразу
+    with handler._cond:
+        for path in sorted(times, reverse=True):
+            handler.add_file(path)
+    handler.stop()
+    assert committed == sorted(times, key=times.__getitem__)
+
+
+def test_block_policy_stops_on_close() -> None:
+    started = threading.Event()
+    release = threading.Event()
+    processed = []
+
+    def callback(path: Path) -> None:
+        started.set()
+        release.wait()
+        processed.append(path)
+
+    handler = AsyncFileHandler(callback, max_workers=1, maxsize=1, policy="block", key=str)
+    handler.add_file(Path("a.csv"))
+    started.wait()
+    handler.add_file(Path("b.csv"))
+    # Очередь заполнена: добавление ждёт места, пока обработчики не остановлены
+    blocked = threading.Thread(target=handler.add_file, args=(Path("c.csv"),))
+    blocked.start()
+    sleep(0.05)
+    assert blocked.is_alive()
+    # stop ждёт обработчик, занятый первым файлом, поэтому в отдельном потоке
+    stopper = threading.Thread(target=handler.stop, kwargs={"drain": False})
+    stopper.start()
+    blocked.join(1)
+    assert not blocked.is_alive()
+    release.set()
+    stopper.join()
+    assert processed == [Path("a.csv")]
@@ -0,0 +1,74 @@
+"""Кадры src.ingest.protocol и приём кадров IngestServer"""
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.api import make_processor
+from src.initializer.initializer import AppParams
+from src.ingest.protocol import FrameError, encode_frame, read_frame, write_frame
+from src.ingest.server import IngestServer
+
+FREQS = np.arange(10500, 10905, 5, dtype=np.float32)
+
+
+def laplace_rows(rows: int, seed: int = 0) -> np.ndarray:
+    """Пик Лапласа в каждой строке на слабом шуме"""
+    rng = np.random.default_rng(seed)
+    mu = rng.uniform(10650, 10750, size=(rows, 1))
+    return (np.exp(-np.abs(FREQS - mu) / 20) + 0.01 * rng.random((rows, FREQS.size))).astype(np.float32)
+
+
+def test_round_trip() -> None:
+    data = laplace_rows(7)
+    stream = io.BytesIO()
+    write_frame(stream, {"name": "a", "freqs": FREQS, "dx": 2}, data)
+    write_frame(stream, {"name": "b", "freqs": FREQS}, data[:3])
+    stream.seek(0)
+
+    header, decoded = read_frame(stream) # type: ignore
+    assert header["name"] == "a" and header["dx"] == 2
+    assert header["freqs"] == FREQS.tolist()
+    np.testing.assert_array_equal(decoded, data)
+    header, decoded = read_frame(stream) # type: ignore
+    assert header["name"] == "b"
+    np.testing.assert_array_equal(decoded, data[:3])
+    assert read_frame(stream) is None
+
+
+@pytest.mark.parametrize("frame", [
+    b"XXXX" + encode_frame({}, np.zeros((1, 1)))[4:],
+    encode_frame({}, np.zeros((2, 3)))[:-1],
+    b"UIDT" + (5).to_bytes(4, "little") + b"{oops",
+])
+def test_bad_frame(frame: bytes) -> None:
+    with pytest.raises(FrameError):
+        read_frame(io.BytesIO(frame))
+
+
+def test_bad_frame_does_not_stop_server(tmp_path: Path) -> None:
+    params = AppParams(data_type="analyze", fit_engine="batched", n_workers=1, archive=False,
+                       point_start=0, point_cut=200, point_end=590)
+    processor = make_processor(params, tmp_path)
+    server = IngestServer(processor, "-")
+    stream = io.BytesIO()
+    write_frame(stream, {"name": "first", "freqs": FREQS, "dx": 2}, laplace_rows(300))
+    # Частот в заголовке меньше, чем столбцов в данных
+    write_frame(stream, {"name": "broken", "freqs": FREQS[:10], "dx": 2}, laplace_rows(300))
+    write_frame(stream, {"name": "second", "freqs": FREQS, "dx": 2}, laplace_rows(300, seed=1))
+    stream.seek(0)
+    reply = io.BytesIO()
+    try:
+        server._serve_stream(stream, reply)
+    finally:
+        processor.close()
+
+    reply.seek(0)
+    answers = [read_frame(reply) for _ in range(3)]
+    assert read_frame(reply) is None
+    assert [header.get("name") for header, _ in answers] == ["first", None, "second"] # type: ignore
+    assert "error" in answers[1][0] # type: ignore
+    for header, peaks in (answers[0], answers[2]): # type: ignore
+        assert peaks.shape[1] == 2 and peaks.shape[0] > 0
+        assert np.all((peaks[:, 1] >= FREQS[0]) & (peaks[:, 1] <= FREQS[-1]))
@@ -0,0 +1,48 @@
+"""fit_engine "batched" находит те же пики, что и curve_fit, в пределах точности,
+указанной в BatchedLaplaceFitter"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.initializer.initializer import AppParams
+from src.processing.peak_finder import PeakFinder
+from src.processing.processor import Processor
+
+STEP = 5
+
+
+def peaks(data_type: str, engine: str, freq: np.ndarray, data: np.ndarray) -> np.ndarray:
+    finder = PeakFinder(data_type, engine)
+    try:
+        return finder.find_peak(finder.create_context(freq, data))
+    finally:
+        finder.pool.close()
+
+
+def test_synthetic() -> None:
+    # Один чистый пик: у всех строк расхождение меньше половины шага, у большинства - ноль
+    rng = np.random.default_rng(0)
+    freq = np.arange(10500, 10905, STEP, dtype=np.float64)
+    mu = rng.uniform(10600, 10800, size=(200, 1))
+    data = np.exp(-np.abs(freq - mu) / rng.uniform(10, 30, size=(200, 1))) + 0.01 * rng.random((200, freq.size))
+    diff = np.abs(peaks("analyze", "batched", freq, data) - peaks("analyze", "curve_fit", freq, data))
+    assert diff.max() <= STEP / 2
+    assert np.median(diff) < 1e-4
+
+
+# Доля строк в пределах половины шага и 95-й перцентиль расхождения из docstring BatchedLaplaceFitter
+@pytest.mark.parametrize("data_type, within_half_step, p95", [("analyze", 0.96, 2.1), ("refl", 0.88, 5.8)])
+def test_sample_file(sample_file: Path, data_type: str, within_half_step: float, p95: float) -> None:
+    processor = Processor(AppParams(data_type=data_type, plots=False, n_workers=1))
+    try:
+        _, data_max, freq, *_ = processor._prepare(sample_file, None, None)
+    finally:
+        processor.close()
+    # Каждая десятая строка: curve_fit по всему файлу идёт десятки секунд
+    data = np.ascontiguousarray(data_max[::10])
+    diff = np.abs(peaks(data_type, "batched", np.asarray(freq), data)
+                  - peaks(data_type, "curve_fit", np.asarray(freq), data))
+    assert np.mean(diff <= STEP / 2) >= within_half_step
+    assert np.percentile(diff, 95) <= p95
+    assert np.median(diff) < 1e-4
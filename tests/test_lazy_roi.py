@@ -0,0 +1,37 @@
+"""lazy_roi: чтение только окна строк даёт те же данные и те же пики, что и чтение файла целиком"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.initializer.initializer import AppParams
+from src.processing.processor import Processor
+from src.reader.trace_reader import RowWindow, TraceReader
+
+
+def test_window_matches_full_read(sample_file: Path) -> None:
+    rows = RowWindow(head=20, start=500, stop=900)
+    reader = TraceReader()
+    full = reader.read(sample_file)
+    lazy = reader.read(sample_file, lambda header: rows)
+    expected = full.window(rows)
+    assert lazy.offset == expected.offset
+    np.testing.assert_array_equal(lazy.body, expected.body)
+    np.testing.assert_array_equal(lazy.ballast, expected.ballast)
+    assert lazy.header.content_hash == full.header.content_hash
+
+
+@pytest.mark.parametrize("data_type", ["analyze", "refl"])
+def test_same_peaks(sample_file: Path, data_type: str) -> None:
+    results = []
+    for lazy_roi in (False, True):
+        params = AppParams(data_type=data_type, fit_engine="batched", plots=False, n_workers=1,
+                           point_start=1000, point_cut=1500, point_end=2000, lazy_roi=lazy_roi)
+        processor = Processor(params)
+        try:
+            results.append(processor.analyze_file(sample_file))
+        finally:
+            processor.close()
+    eager, lazy = results
+    np.testing.assert_array_equal(lazy.length, eager.length)
+    np.testing.assert_array_equal(lazy.f0, eager.f0)
@@ -0,0 +1,77 @@
+"""Журнал обработанных файлов: пропуск обработанных, повторная обработка при смене параметров"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.initializer.initializer import AppParams
+from src.processing.processor import Processor
+from src.saver.manifest import Manifest
+
+
+def make_processor(**update) -> Processor:
+    params = AppParams(data_type="analyze", fit_engine="batched", plots=False, metrics=False,
+                       n_workers=1, point_start=0, point_cut=200, point_end=390)
+    return Processor(params.model_copy(update=update))
+
+
+def test_skip_processed(trace_file: Path) -> None:
+    processor = make_processor()
+    assert processor.lookup_processed(trace_file) is None
+    processor.process_file(trace_file)
+    processor.close()
+
+    # Новый запуск с теми же параметрами (n_workers не влияет на результат)
+    again = make_processor(n_workers=2)
+    restored = again.lookup_processed(trace_file)
+    again.close()
+    assert restored is not None and restored.restored
+    record = json.loads((trace_file.parent / "Peaks" / "manifest.jsonl").read_text().splitlines()[0])
+    np.testing.assert_array_equal(restored.f0, record["f0"])
+    np.testing.assert_array_equal(restored.length, record["length"])
+
+
+def test_reprocess_on_params_change(trace_file: Path) -> None:
+    processor = make_processor()
+    processor.process_file(trace_file)
+    processor.close()
+    for update in ({"num_pts_norm": 10}, {"fit_engine": "curve_fit"}, {"point_end": 300}):
+        changed = make_processor(**update)
+        assert changed.lookup_processed(trace_file) is None, update
+        changed.close()
+
+
+def test_reprocess_on_content_change(tmp_path: Path, trace_file: Path) -> None:
+    manifest = Manifest(tmp_path / "Peaks" / "manifest.jsonl", "params")
+    manifest.add(trace_file, [], np.zeros(3), np.arange(3.0))
+    assert Manifest(manifest.path, "params").lookup(trace_file) is not None
+    with trace_file.open("a", encoding="utf-8") as f:
+        f.write("\n")
+    assert Manifest(manifest.path, "params").lookup(trace_file) is None
+
+
+def test_deltas_and_compaction(tmp_path: Path, trace_file: Path) -> None:
+    figure = tmp_path / "Figures" / "plot.png"
+    manifest = Manifest(tmp_path / "Peaks" / "manifest.jsonl", "params")
+    manifest.add(trace_file, [], np.zeros(3), np.arange(3.0), pending=[figure])
+    # График ещё в очереди: файл не считается обработанным
+    assert Manifest(manifest.path, "params").lookup(trace_file) is None
+
+    figure.parent.mkdir()
+    figure.write_bytes(b"")
+    manifest.add_artifacts(trace_file, [figure])
+    manifest.mark_archived(trace_file)
+    lines = manifest.path.read_text().splitlines()
+    assert len(lines) == 3
+    assert [json.loads(line).get("delta") for line in lines[1:]] == [{"artifacts": ["Figures/plot.png"]},
+                                                                     {"archived": True}]
+
+    loaded = Manifest(manifest.path, "params")
+    record = loaded.lookup(trace_file)
+    assert record is not None
+    assert record["artifacts"] == ["Figures/plot.png"] and record["archived"]
+    # При чтении журнал переписан по одной строке на файл
+    assert manifest.path.read_text().splitlines() == [json.dumps(record)]
+    os.remove(figure)
+    assert Manifest(manifest.path, "params").lookup(trace_file) is None
@@ -0,0 +1,55 @@
+"""PeakArchive.query: отбор пиков архива по дате, сессии и расстоянию"""
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.saver.peak_archive import PeakArchive
+
+LENGTH = np.arange(0, 100, 2.0)
+
+
+@pytest.fixture
+def archive(tmp_path: Path) -> Path:
+    """Две сессии, файлы за 1, 2 и 5 апреля; f0 = день месяца * 1000 + расстояние"""
+    days = {"s1": [datetime(2025, 4, 1, 10), datetime(2025, 4, 2, 10)],
+            "s2": [datetime(2025, 4, 2, 18), datetime(2025, 4, 5, 9)]}
+    flushed = []
+    for session, times in days.items():
+        saver = PeakArchive(session, flush_every=1, on_flush=flushed.extend)
+        for moment in times:
+            name = f"{session}_{moment:%d_%H}"
+            saver.add(tmp_path, name, moment, LENGTH, moment.day * 1000 + LENGTH, source=Path(name))
+        saver.flush()
+    assert len(flushed) == 4
+    return tmp_path / PeakArchive.DIR_NAME
+
+
+def test_all(archive: Path) -> None:
+    peaks = PeakArchive.query(archive)
+    assert peaks.height == 4 * LENGTH.size
+    assert peaks.columns == ["trace_time", "distance", "f0", "file", "session"]
+    times = peaks["trace_time"].to_numpy()
+    assert (times[1:] >= times[:-1]).all()
+
+
+def test_dates(archive: Path) -> None:
+    peaks = PeakArchive.query(archive, since=datetime(2025, 4, 2), until=datetime(2025, 4, 2, 23, 59, 59))
+    assert sorted(set(peaks["file"])) == ["s1_02_10", "s2_02_18"]
+    # Граница внутри дня: только вечерний файл
+    peaks = PeakArchive.query(archive, since=datetime(2025, 4, 2, 12))
+    assert sorted(set(peaks["file"])) == ["s2_02_18", "s2_05_09"]
+
+
+def test_session(archive: Path) -> None:
+    peaks = PeakArchive.query(archive, session="s1")
+    assert set(peaks["session"]) == {"s1"}
+    assert sorted(set(peaks["file"])) == ["s1_01_10", "s1_02_10"]
+
+
+def test_distance(archive: Path) -> None:
+    peaks = PeakArchive.query(archive, distance_from=10, distance_to=20, session="s2",
+                              until=datetime(2025, 4, 3))
+    np.testing.assert_array_equal(peaks["distance"].to_numpy(), np.arange(10, 21, 2.0))
+    np.testing.assert_array_equal(peaks["f0"].to_numpy(), 2000 + np.arange(10, 21, 2.0))
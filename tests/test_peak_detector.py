@@ -0,0 +1,39 @@
+"""PeakFinder._get_peaks_vectorized должен находить те же пики, что и PeakFinder._get_peaks.
+
+Строки с точно равными высотами пиков могли бы разойтись (порядок выбора среди равных
+зависит от сортировки), но ни в файле из test_path, ни в случайных данных ниже их нет.
+"""
+import numpy as np
+import pytest
+
+from src.processing.peak_finder import PeakFinder
+
+
+def assert_same_peaks(data: np.ndarray) -> None:
+    lo, hi = PeakFinder._get_peaks(data)
+    lo_vec, hi_vec = PeakFinder._get_peaks_vectorized(data)
+    np.testing.assert_array_equal(lo_vec, lo)
+    np.testing.assert_array_equal(hi_vec, hi)
+
+
+def test_sample_file(sample_norm: np.ndarray) -> None:
+    assert_same_peaks(sample_norm)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_data(seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    assert_same_peaks(rng.random((500, 81)).astype(np.float32))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_peaks(seed: int) -> None:
+    # Один или два пика Лапласа на шуме, как на реальной линии
+    rng = np.random.default_rng(seed)
+    x = np.arange(81)
+    mu = rng.uniform(5, 75, size=(300, 2))
+    height = rng.uniform(0.2, 1, size=(300, 2))
+    data = (height[:, :1] * np.exp(-np.abs(x - mu[:, :1]) / 4)
+            + height[:, 1:] * np.exp(-np.abs(x - mu[:, 1:]) / 4)
+            + 0.05 * rng.random((300, x.size)))
+    assert_same_peaks(data.astype(np.float32))
@@ -0,0 +1,39 @@
+"""Широкая таблица, собранная из <время запуска>_long.csv, совпадает с прежним форматом"""
+from pathlib import Path
+
+import numpy as np
+
+from src.saver.peak_saver import PeakSaver
+
+
+def baseline_table(peaks: list[tuple[str, np.ndarray, np.ndarray]], path: Path) -> None:
+    """Прежний PeakSaver.save_file: столбец длины последнего файла и по столбцу на файл"""
+    data = np.zeros((max(f0.size for _, _, f0 in peaks) + 1, len(peaks) + 1), dtype=object)
+    data[0, 1:] = [name for name, _, _ in peaks]
+    data[0, 0] = "Длина"
+    length = peaks[-1][1]
+    data[1: length.size + 1, 0] = length
+    for i, (_, _, f0) in enumerate(peaks):
+        data[1: f0.size + 1, i + 1] = f0
+    np.savetxt(path, data, fmt="%s", delimiter=";")
+
+
+def test_wide_table_matches_baseline(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    peaks = []
+    for i, size in enumerate([300, 300, 250, 300]):
+        length = np.arange(size) * 2.0 + 100
+        peaks.append((f"exp_{i}", length, 10800 + rng.normal(0, 5, size)))
+    # Повторно обработанный файл - отдельный столбец
+    peaks.append(peaks[1])
+
+    saver = PeakSaver(tmp_path / "Peaks", flush_every=2)
+    for name, length, f0 in peaks:
+        saver.add_peak(f0, name, length)
+    saver.save_file()
+
+    baseline_table(peaks, tmp_path / "baseline.csv")
+    assert (tmp_path / "Peaks" / saver.fname).read_text() == (tmp_path / "baseline.csv").read_text()
+    long = saver.long_path().read_text().splitlines()
+    assert long[0] + "\n" == PeakSaver.LONG_HEADER
+    assert len(long) == 1 + sum(f0.size for _, _, f0 in peaks)
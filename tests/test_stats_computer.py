@@ -0,0 +1,41 @@
+"""StatsComputer.compute совпадает с прежним подсчётом по каждому окну в цикле"""
+import numpy as np
+import pytest
+
+from src.processing.stats_computer import StatsComputer
+
+
+def loop_stats(peaks: np.ndarray, window: int) -> dict[str, np.ndarray]:
+    """Прежний расчёт: отражение краёв и статистики каждого окна по отдельности"""
+    window = window if window % 2 else window + 1
+    x_pad = np.pad(peaks, pad_width=window // 2, mode='reflect')
+    windows = [x_pad[i: i + window] for i in range(peaks.size)]
+    median = np.array([np.median(w) for w in windows])
+    return {
+        "mean": np.array([np.mean(w) for w in windows]),
+        "std": np.array([np.std(w) for w in windows]),
+        "median": median,
+        "mad": np.array([np.median(np.abs(w - m)) for w, m in zip(windows, median)]),
+        "min": np.array([np.min(w) for w in windows]),
+        "max": np.array([np.max(w) for w in windows]),
+    }
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_loop(seed: int) -> None:
+    # Частоты пиков порядка 10^4 МГц: проверяется и точность E[x^2] - E[x]^2
+    rng = np.random.default_rng(seed)
+    peaks = 10800 + np.cumsum(rng.normal(0, 0.5, 1500)) + rng.normal(0, 2, 1500)
+    windows = (4, 11, 51)
+    stats = StatsComputer(windows).compute(peaks)
+    for window in windows:
+        expected = loop_stats(peaks, window)
+        result = stats[window if window % 2 else window + 1]
+        for name, values in expected.items():
+            np.testing.assert_allclose(getattr(result, name), values, rtol=0, atol=1e-6, err_msg=name)
+
+
+def test_compute_std_single_window() -> None:
+    peaks = np.random.default_rng(0).normal(10800, 3, 200)
+    np.testing.assert_allclose(StatsComputer(10).compute_std(peaks), loop_stats(peaks, 10)["std"],
+                               rtol=0, atol=1e-6)
@@ -0,0 +1,54 @@
+"""TraceCache: запись сбрасывается при изменении размера или времени изменения файла"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.reader.trace_cache import TraceCache
+from src.reader.trace_reader import TraceReader
+
+
+def test_hit(trace_file: Path) -> None:
+    cache = TraceCache(mode="on")
+    trace = TraceReader().read(trace_file)
+    assert cache.load(trace_file) is None
+    cache.store(trace_file, trace)
+    cached = cache.load(trace_file)
+    assert cached is not None
+    np.testing.assert_array_equal(cached.body, trace.body)
+    np.testing.assert_array_equal(cached.header.freqs, trace.header.freqs)
+    assert cached.header.points == trace.header.points
+    assert cached.header.content_hash == trace.header.content_hash
+
+
+def test_mtime_change(trace_file: Path) -> None:
+    cache = TraceCache(mode="on")
+    cache.store(trace_file, TraceReader().read(trace_file))
+    # Тот же размер, другое содержимое и время изменения
+    text = trace_file.read_text(encoding="utf-8")
+    trace_file.write_text(text.replace("3240.", "3241."), encoding="utf-8")
+    stat = trace_file.stat()
+    os.utime(trace_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load(trace_file) is None
+
+
+def test_size_change(trace_file: Path) -> None:
+    cache = TraceCache(mode="on")
+    cache.store(trace_file, TraceReader().read(trace_file))
+    stat = trace_file.stat()
+    with trace_file.open("a", encoding="utf-8") as f:
+        f.write("\n")
+    # Время изменения прежнее, отличается только размер
+    os.utime(trace_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.load(trace_file) is None
+
+
+def test_modes(trace_file: Path) -> None:
+    trace = TraceReader().read(trace_file)
+    TraceCache(mode="off").store(trace_file, trace)
+    assert not (trace_file.parent / ".cache").exists()
+    # rebuild перезаписывает кэш, но не читает его
+    rebuild = TraceCache(mode="rebuild")
+    rebuild.store(trace_file, trace)
+    assert rebuild.load(trace_file) is None
+    assert TraceCache(mode="on").load(trace_file) is not None